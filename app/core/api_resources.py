@@ -5,11 +5,70 @@ API Resources
             deleted through the API endpoints
         2. Task collection - All tasks  created, read, updated and
             deleted through the API endpoints
-        3. Logging level - Logging level for the API
+        3. Screen data - Screen data and screen objects of every capture
+        4. Logging level - Logging level for the API
+    Actions and tasks are stored as json files or in a SQLite database
+    depending on the COLLECTION_ENGINE setting.  Both can be listed one page
+    at a time or streamed as newline delimited json.
 """
+import itertools
+import json
 import logging
-
-from . import models, redis_cache
+import os
+from typing import Iterator, List, Optional, Tuple
+
+from . import blob_store, models, redis_cache
+
+COLLECTION_ENGINE = os.environ.get("COLLECTION_ENGINE", "json")
+COLLECTION_ENGINES = {
+    "json": models.JsonCollectionResource,
+    "sqlite": models.SqliteCollectionResource,
+}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def project(obj: dict, fields: Optional[List[str]] = None) -> dict:
+    """Keeps only the requested fields of a resource"""
+    if not fields:
+        return obj
+    return {field: obj.get(field) for field in fields}
+
+
+def list_collection(
+    collection,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    function: Optional[str] = None,
+    id_prefix: Optional[str] = None,
+) -> dict:
+    """Returns one page of a collection in id order.  The next cursor is the
+    id of the last resource of the page or None on the last page."""
+    resources = list(
+        itertools.islice(
+            collection.iter_collections(cursor, id_prefix, function),
+            limit + 1,
+        )
+    )
+    page = resources[:limit]
+    next_cursor = page[-1][0] if len(resources) > limit else None
+    return {
+        "data": [project(obj, fields) for _, obj in page],
+        "next_cursor": next_cursor,
+    }
+
+
+def stream_collection(
+    collection,
+    fields: Optional[List[str]] = None,
+    function: Optional[str] = None,
+    id_prefix: Optional[str] = None,
+) -> Iterator[str]:
+    """Yields the resources of a collection as newline delimited json"""
+    for _, obj in collection.iter_collections(None, id_prefix, function):
+        yield f"{json.dumps(project(obj, fields))}\n"
 
 
 class APICollections:
@@ -18,21 +77,22 @@ class APICollections:
         action_collection: models.Action = None,
         task_collection: models.Task = None,
         logging_level=None,
+        collection_engine: str = COLLECTION_ENGINE,
     ):
+        collection_cls = COLLECTION_ENGINES.get(collection_engine)
+        if collection_cls is None:
+            raise ValueError(f"Invalid collection engine: {collection_engine}")
         if logging_level == logging.DEBUG:
-            self.action_collection = (
-                action_collection
-                or models.JsonCollectionResource(models.Action, testing=True)
+            self.action_collection = action_collection or collection_cls(
+                models.Action, testing=True
             )
-            self.task_collection = (
-                task_collection
-                or models.JsonCollectionResource(models.Task, testing=True)
+            self.task_collection = task_collection or collection_cls(
+                models.Task, testing=True
             )
         else:
-            self.action_collection = models.JsonCollectionResource(
-                models.Action
-            )
-            self.task_collection = models.JsonCollectionResource(models.Task)
+            self.action_collection = collection_cls(models.Action)
+            self.task_collection = collection_cls(models.Task)
+        self.screen_data = models.ScreenDataResource()
 
         self.logging_level = logging.WARNING
 
@@ -50,15 +110,55 @@ class APICollections:
         redis_cache.set_json("action", response.get("id"), response)
         return response
 
-    def get_action_collection(self) -> dict:
-        return self.action_collection.get_all_collections()
+    def has_action(self, action_id: str) -> bool:
+        return self.action_collection.has_collection(action_id)
+
+    def get_action_collection(self, force_refresh: bool = False) -> dict:
+        return self.action_collection.get_all_collections(force_refresh)
+
+    def list_actions(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        function: Optional[str] = None,
+        id_prefix: Optional[str] = None,
+    ) -> dict:
+        return list_collection(
+            self.action_collection, limit, cursor, fields, function, id_prefix
+        )
+
+    def stream_actions(
+        self,
+        fields: Optional[List[str]] = None,
+        function: Optional[str] = None,
+        id_prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        return stream_collection(
+            self.action_collection, fields, function, id_prefix
+        )
 
     def update_action(
         self, action_id: str, action: models.Action
     ) -> models.Action:
         response = self.action_collection.update_collection(action_id, action)
         redis_cache.set_json("action", response.id, response.dict())
-        return self.action_collection.update_collection(action_id, action)
+        return response
+
+    def update_actions(
+        self, actions: List[models.Action]
+    ) -> List[models.Action]:
+        """Updates several actions in one pass such as the actions of a
+        batch capture"""
+        responses = []
+        for action in actions:
+            response = self.action_collection.update_collection(
+                action.id, action
+            )
+            if isinstance(response, models.Action):
+                redis_cache.set_json("action", response.id, response.dict())
+            responses.append(response)
+        return responses
 
     def delete_action(self, action_id):
         response = self.action_collection.delete_collection(action_id)
@@ -80,13 +180,38 @@ class APICollections:
         redis_cache.set_json("task", response.get("id"), response)
         return response
 
-    def get_task_collection(self) -> dict:
-        return self.task_collection.get_all_collections()
+    def has_task(self, task_id: str) -> bool:
+        return self.task_collection.has_collection(task_id)
+
+    def get_task_collection(self, force_refresh: bool = False) -> dict:
+        return self.task_collection.get_all_collections(force_refresh)
+
+    def list_tasks(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        function: Optional[str] = None,
+        id_prefix: Optional[str] = None,
+    ) -> dict:
+        return list_collection(
+            self.task_collection, limit, cursor, fields, function, id_prefix
+        )
+
+    def stream_tasks(
+        self,
+        fields: Optional[List[str]] = None,
+        function: Optional[str] = None,
+        id_prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        return stream_collection(
+            self.task_collection, fields, function, id_prefix
+        )
 
     def update_task(self, task_id: str, task: models.Task) -> models.Task:
         response = self.task_collection.update_collection(task_id, task)
         redis_cache.set_json("task", response.id, response.dict())
-        return self.task_collection.update_collection(task_id, task)
+        return response
 
     def delete_task(self, task_id: str):
         response = self.task_collection.delete_collection(task_id)
@@ -94,5 +219,29 @@ class APICollections:
             redis_cache.del_json("task", task_id)
         return response
 
+    def store_screen_data(
+        self,
+        screen_data: models.ScreenData,
+        screen_objects: List[models.ScreenObject],
+    ) -> dict:
+        return self.screen_data.store_resource(screen_data, screen_objects)
+
+    def store_screen_data_batch(
+        self,
+        captures: List[Tuple[models.ScreenData, List[models.ScreenObject]]],
+    ) -> dict:
+        return self.screen_data.store_resources(captures)
+
+    def get_screen_data(
+        self, screen_data_id: str, include_base64: bool = False
+    ) -> Optional[dict]:
+        screen_data = self.screen_data.get_screen_data(screen_data_id)
+        if screen_data and include_base64:
+            blob_store.inline_base64(screen_data)
+        return screen_data
+
+    def get_screen_object(self, screen_obj_id: str) -> Optional[dict]:
+        return self.screen_data.get_screen_object(screen_obj_id)
+
 
 storage = APICollections()
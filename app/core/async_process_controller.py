@@ -1,15 +1,201 @@
 """
 These functions are used to search for multiple images within a screen by
-using a ProcessPoolExecutor.  This is used to speed up the search for
-multiple images.  The functions are called from app/core/process_controller.py
-within asyncio.run().
+using a long lived ProcessPoolExecutor.  All needles are matched against the
+haystack in a single job so the haystack is only decoded once.  Frames that
+are grabbed from the display reach the workers through shared memory.  The
+functions are called from app/core/process_controller.py within
+asyncio.run().
+    Image search pool
+        1. Workers are started once and pre-warmed so a search does not pay
+            for process spawn and module imports
+        2. Workers are started from a forkserver so they never import the
+            process controller and its xvfb display setup
+        3. The pool is recycled after a number of jobs and restarted when it
+            is found to be broken by a health check
 """
 import asyncio
+import logging
+import multiprocessing
+import os
+import threading
 import tracemalloc
-from concurrent.futures.process import ProcessPoolExecutor
-from typing import Optional
+from concurrent.futures import Future, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple, Union
 
-from . import models, process_controller
+import numpy as np
+
+from . import image_matching, models, screen_capture
+
+IMAGE_POOL_SIZE = int(os.environ.get("IMAGE_POOL_SIZE", 2))
+IMAGE_POOL_MAX_JOBS = int(os.environ.get("IMAGE_POOL_MAX_JOBS", 1000))
+IMAGE_POOL_START_METHOD = os.environ.get(
+    "IMAGE_POOL_START_METHOD", "forkserver"
+)
+
+
+def _init_worker() -> None:
+    tracemalloc.start()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _search_shared_haystack(
+    needle_file_names: List[str],
+    shm_name: str,
+    shape: Tuple[int, ...],
+    dtype: str,
+    percent_similarity: float,
+    mode: str,
+    method: str,
+) -> dict:
+    """Attaches to a haystack in shared memory and searches for the needles"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        haystack = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        search_result = image_matching.image_search_many(
+            needle_file_names, haystack, percent_similarity, mode, method
+        )
+        del haystack
+    finally:
+        shm.close()
+    return search_result
+
+
+class ImageSearchPool:
+    """Process pool that lives as long as the app and is shared by every
+    image search"""
+
+    def __init__(
+        self,
+        max_workers: int = IMAGE_POOL_SIZE,
+        max_jobs: int = IMAGE_POOL_MAX_JOBS,
+        start_method: str = IMAGE_POOL_START_METHOD,
+    ):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.start_method = start_method
+        self.jobs_since_recycle = 0
+        self.total_jobs = 0
+        self.recycles = 0
+        self.restarts = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        mp_context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            mp_context.set_forkserver_preload(["core.image_matching"])
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+        )
+
+    def _prewarm(self, executor: ProcessPoolExecutor, timeout=None) -> bool:
+        """Starts every worker process by sending it a ping"""
+        futures = [executor.submit(_ping) for _ in range(self.max_workers)]
+        if timeout == 0:
+            return True
+        done, not_done = wait(futures, timeout=timeout)
+        return not not_done and all(
+            future.exception() is None for future in done
+        )
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+                self._prewarm(self._executor)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def restart(self, executor: ProcessPoolExecutor = None) -> bool:
+        """Replaces the executor unless it is not the broken executor anymore
+        because another caller has already recycled or restarted it"""
+        with self._lock:
+            if executor is not None and self._executor is not executor:
+                return False
+            self._replace_executor()
+            self.restarts += 1
+            return True
+
+    def _replace_executor(self) -> None:
+        """Swaps in a new executor while the old one finishes its jobs"""
+        old_executor = self._executor
+        self._executor = self._create_executor()
+        self._prewarm(self._executor, timeout=0)
+        self.jobs_since_recycle = 0
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    def submit(self, fn, *args) -> Tuple[ProcessPoolExecutor, Future]:
+        """Submits a job while holding the lock so the executor can not be
+        recycled between choosing it and submitting to it"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            elif self.jobs_since_recycle >= self.max_jobs:
+                self._replace_executor()
+                self.recycles += 1
+            self.jobs_since_recycle += 1
+            self.total_jobs += 1
+            return self._executor, self._executor.submit(fn, *args)
+
+    async def run(self, fn, *args):
+        """Runs a job in the pool and restarts the pool once if it is broken"""
+        executor, future = self.submit(fn, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            logging.warning("Image search pool is broken, restarting")
+            self.restart(executor)
+            executor, future = self.submit(fn, *args)
+            return await asyncio.wrap_future(future)
+
+    def _ping_workers(
+        self, executor: ProcessPoolExecutor, timeout: float
+    ) -> bool:
+        try:
+            return self._prewarm(executor, timeout=timeout)
+        except (BrokenProcessPool, RuntimeError, TimeoutError):
+            return False
+
+    def health_check(self, timeout: float = 5.0) -> dict:
+        """Pings every worker and restarts the pool when one does not answer"""
+        with self._lock:
+            executor = self._executor
+        healthy = executor is not None
+        if healthy:
+            healthy = self._ping_workers(executor, timeout)
+            if not healthy and not self.restart(executor):
+                """The pool was recycled while it was pinged so the old
+                executor refused the pings and the new one is checked"""
+                with self._lock:
+                    executor = self._executor
+                healthy = self._ping_workers(executor, timeout)
+                if not healthy:
+                    self.restart(executor)
+        return {
+            "healthy": healthy,
+            "started": executor is not None,
+            "max_workers": self.max_workers,
+            "max_jobs": self.max_jobs,
+            "jobs_since_recycle": self.jobs_since_recycle,
+            "total_jobs": self.total_jobs,
+            "recycles": self.recycles,
+            "restarts": self.restarts,
+        }
+
+
+image_search_pool = ImageSearchPool()
 
 
 async def get_image_present_result(
@@ -18,36 +204,53 @@ async def get_image_present_result(
     """Evaluates conditionals for an action"""
     images = action.get("images")
     haystack_image = action.get("haystack_image")
-    haystack_file_name = haystack_image or screenshot_file
-    with ProcessPoolExecutor(initializer=tracemalloc.start) as ppe:
-        batches = [
-            evaluate_image_conditional(ppe, image, haystack_file_name)
-            for image in images
-        ]
-        done, pending = await asyncio.wait(batches)
-    assert len(pending) == 0
-    results = [task.result() for task in done]
-    return any(results)
+    haystack = haystack_image or screenshot_file
+    if not haystack:
+        haystack = screen_capture.grab_frame(grayscale=True)
+    search_result = await evaluate_image_conditional(
+        images, haystack, method=action.get("image_search_method") or "exact"
+    )
+    return search_result.get("result")
 
 
 async def evaluate_image_conditional(
-    pool: ProcessPoolExecutor,
-    variable_value: str,
-    comparison_value: Optional[str] = None,
-) -> Optional[bool]:
-    """Comparison value is provided by user and the variable_value is from
-    capture_screen_data action.  This is used to compare the two values
-    and return a boolean result."""
-    """Check to see if image is present before doing action"""
-    loop = asyncio.get_event_loop()
-    x, y = await loop.run_in_executor(
-        pool,
-        process_controller.image_search,
-        variable_value,
-        comparison_value,
-        0.9,
-        False,
-    )
-    if x == -1 or y == -1:
-        return False
-    return True
+    needle_file_names: List[str],
+    haystack: Union[str, np.ndarray],
+    mode: str = "any",
+    pool: Optional[ImageSearchPool] = None,
+    method: str = "exact",
+) -> dict:
+    """Check to see if any or all of the images are present in the haystack
+    before doing action.  Haystack arrays are copied into shared memory
+    instead of being pickled to the worker."""
+    pool = pool or image_search_pool
+    if isinstance(haystack, str):
+        return await pool.run(
+            image_matching.image_search_many,
+            needle_file_names,
+            haystack,
+            0.9,
+            mode,
+            method,
+        )
+
+    shm = shared_memory.SharedMemory(create=True, size=max(haystack.nbytes, 1))
+    try:
+        shared_haystack = np.ndarray(
+            haystack.shape, dtype=haystack.dtype, buffer=shm.buf
+        )
+        shared_haystack[...] = haystack
+        del shared_haystack
+        return await pool.run(
+            _search_shared_haystack,
+            needle_file_names,
+            shm.name,
+            haystack.shape,
+            haystack.dtype.str,
+            0.9,
+            mode,
+            method,
+        )
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,119 @@
+"""
+Blob Store
+    Content addressed storage for the image bytes of snips and captures so
+    they are not kept as base64 strings inside json files.
+        1. Blobs are stored once under the sha256 of their bytes which
+            deduplicates identical snips and captures
+        2. A blob is written to a temporary file and renamed so a reader
+            never sees a partially written blob
+        3. Models reference blobs by id and base64 is only encoded when a
+            client asks for it
+        4. Resources that were stored with a base64 string before the blob
+            store are still read
+"""
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from . import models
+
+blob_dir = models.resources_dir / "blobs"
+BLOB_FILE_MODE = 0o644
+
+
+class BlobStore:
+    """Stores bytes in files named after their sha256 which are spread over
+    sub directories named after the first two characters of the hash"""
+
+    def __init__(self, directory: Path = blob_dir):
+        self.directory = directory
+        self.writes = 0
+        self.deduplicated = 0
+
+    def get_path(self, blob_id: str) -> Path:
+        if len(blob_id) != 64 or not all(
+            char in "0123456789abcdef" for char in blob_id
+        ):
+            raise ValueError(f"Invalid blob id: {blob_id}")
+        return self.directory / blob_id[:2] / blob_id
+
+    def put(self, data: bytes) -> str:
+        """Stores the bytes unless a blob with the same content exists and
+        returns the blob id"""
+        blob_id = hashlib.sha256(data).hexdigest()
+        file_path = self.get_path(blob_id)
+        if file_path.is_file():
+            self.deduplicated += 1
+            return blob_id
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=file_path.parent)
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(data)
+            """mkstemp creates the file readable by its owner only"""
+            os.chmod(temp_path, BLOB_FILE_MODE)
+            os.replace(temp_path, file_path)
+        except OSError:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self.writes += 1
+        return blob_id
+
+    def get(self, blob_id: str) -> Optional[bytes]:
+        try:
+            return self.get_path(blob_id).read_bytes()
+        except (OSError, ValueError):
+            logging.debug(f"Blob does not exist: {blob_id}")
+            return None
+
+    def has(self, blob_id: str) -> bool:
+        try:
+            return self.get_path(blob_id).is_file()
+        except ValueError:
+            return False
+
+    def get_base64(self, blob_id: str) -> Optional[str]:
+        data = self.get(blob_id)
+        if data is None:
+            return None
+        return base64.b64encode(data).decode("utf-8")
+
+    def delete(self, blob_id: str) -> dict:
+        """Deletes the blob without checking whether any resource still
+        references it.  Blobs are shared by resources with identical images
+        so callers have to make sure the blob is not used anymore."""
+        response = {"data": f"Deleted blob: {blob_id}"}
+        try:
+            self.get_path(blob_id).unlink()
+        except (OSError, ValueError):
+            response = {"data": f"Blob does not exist: {blob_id}"}
+        logging.debug(response)
+        return response
+
+    def stats(self) -> dict:
+        return {"writes": self.writes, "deduplicated": self.deduplicated}
+
+
+blob_store = BlobStore()
+
+
+def read_image_bytes(resource: dict) -> Optional[bytes]:
+    """Returns the image bytes of an Image or ScreenData resource from its
+    blob or from the base64 string of resources stored before blobs"""
+    if resource.get("blob_id"):
+        return blob_store.get(resource["blob_id"])
+    if resource.get("base64str"):
+        return base64.b64decode(resource["base64str"])
+    return None
+
+
+def inline_base64(resource: dict) -> dict:
+    """Adds the base64 string of the blob of a resource for clients that
+    ask for it"""
+    if resource.get("blob_id") and not resource.get("base64str"):
+        resource["base64str"] = blob_store.get_base64(resource["blob_id"])
+    return resource
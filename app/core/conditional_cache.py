@@ -0,0 +1,116 @@
+"""
+Conditional Cache
+    Memoizes the result and matches of an action's image conditionals for a
+    screen.
+        1. Results are keyed by a digest of the action fields used by the
+            conditionals and a digest of the haystack content, so an unchanged
+            screen returns the previous result without any template matching
+        2. Entries expire after a time to live and the least recently used
+            entries are evicted when the cache is full
+        3. Hit and miss counters are kept for the cache stats endpoint
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from . import models
+
+CONDITIONAL_CACHE_MAX_ENTRIES = int(
+    os.environ.get("CONDITIONAL_CACHE_MAX_ENTRIES", 256)
+)
+CONDITIONAL_CACHE_TTL = float(os.environ.get("CONDITIONAL_CACHE_TTL", 5.0))
+CONDITIONAL_FIELDS = (
+    "id",
+    "images",
+    "haystack_image",
+    "image_conditions",
+    "image_search_method",
+    "variables",
+    "variable_conditions",
+    "comparison_values",
+)
+
+
+def action_digest(action: models.Action) -> str:
+    """Digest of the action id and every field that changes the result of
+    its conditionals, so an edited action is never served a stale result"""
+    if not isinstance(action, dict):
+        action = action.dict()
+    action_fields = {field: action.get(field) for field in CONDITIONAL_FIELDS}
+    return hashlib.blake2b(
+        json.dumps(action_fields, sort_keys=True).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+
+
+def content_digest(image: np.ndarray) -> str:
+    """Digest of the pixels and shape of an image"""
+    content_hash = hashlib.blake2b(str(image.shape).encode(), digest_size=16)
+    content_hash.update(np.ascontiguousarray(image).data)
+    return content_hash.hexdigest()
+
+
+def get_cache_key(
+    action: models.Action, haystack: np.ndarray
+) -> Tuple[str, str]:
+    return action_digest(action), content_digest(haystack)
+
+
+class ConditionalResultCache:
+    """Least recently used cache of conditional results with a time to live"""
+
+    def __init__(
+        self,
+        max_entries: int = CONDITIONAL_CACHE_MAX_ENTRIES,
+        ttl: float = CONDITIONAL_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[dict]:
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if expires_at > time.monotonic():
+                    self._results.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._results[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Tuple[str, str], result: dict) -> None:
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._results),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+conditional_cache = ConditionalResultCache()
@@ -7,8 +7,23 @@ Conditionals:
 
 Results:
     All possible results of conditions being True/False
+
+Image search methods:
+    All possible methods for finding an image within the screen
+
+OCR profiles:
+    Preprocessing of a captured region before OCR ordered from the most to the
+    least expensive.  Each profile has a scale factor, the interpolation used
+    to resize, the threshold mode (otsu, adaptive or none) and if the
+    thresholded image is inverted.
+
+OCR modes:
+    Tesseract page segmentation mode and character whitelist used for OCR
+    and if recognized words have to be found in the english dictionary.  The
+    glyph mode reads the region with learned glyph templates and only uses
+    OCR with these settings when a glyph is not recognized.
 """
-from typing import List
+from typing import Dict, List
 
 ACTIONS: List[str] = [
     "click",
@@ -45,3 +60,55 @@ RESULTS: List[str] = [
     "spawn_process",
     "repeat",
 ]
+
+IMAGE_SEARCH_METHODS: List[str] = [
+    "exact",
+    "pyramid",
+]
+
+OCR_PROFILES: Dict[str, dict] = {
+    "default": {
+        "scale": 5,
+        "interpolation": "linear",
+        "threshold": "otsu",
+        "invert": False,
+    },
+    "inverted": {
+        "scale": 5,
+        "interpolation": "linear",
+        "threshold": "otsu",
+        "invert": True,
+    },
+    "adaptive": {
+        "scale": 3,
+        "interpolation": "cubic",
+        "threshold": "adaptive",
+        "invert": False,
+    },
+    "medium": {
+        "scale": 2,
+        "interpolation": "cubic",
+        "threshold": "otsu",
+        "invert": False,
+    },
+    "fast": {
+        "scale": 1,
+        "interpolation": "linear",
+        "threshold": "otsu",
+        "invert": False,
+    },
+    "grayscale": {
+        "scale": 1,
+        "interpolation": "linear",
+        "threshold": "none",
+        "invert": False,
+    },
+}
+
+OCR_MODES: Dict[str, dict] = {
+    "default": {"psm": 3, "whitelist": None, "dictionary": True},
+    "single_line": {"psm": 7, "whitelist": None, "dictionary": True},
+    "single_word": {"psm": 8, "whitelist": None, "dictionary": True},
+    "numeric": {"psm": 7, "whitelist": "0123456789.-", "dictionary": False},
+    "glyph": {"psm": 7, "whitelist": None, "dictionary": False},
+}
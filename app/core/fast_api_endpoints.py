@@ -2,27 +2,41 @@
 Fast API Endpoints
     These endpoints are used to:
         - CRUD JSON Data
+        - List actions and tasks one page at a time or as a stream
         - Open the browser within the xvfb virtual display
         - Capture screen data from the xvfb virtual display
         - Interact with the process controller:
             1. Execute Actions
             2. Execute Tasks
+        - Report in-process cache statistics and pipeline stage timings
+        - Start, stop and health check the image search process pool
 """
 import asyncio
 import logging
-from typing import List
+from typing import List, Optional
 
 from . import (
     api_resources,
+    async_process_controller,
     asyncio_utils,
+    blob_store,
     celery_worker,
+    conditional_cache,
+    constants,
+    glyph_recognizer,
+    image_cache,
     models,
+    ocr_cache,
+    ocr_engine,
     process_controller,
+    search_hints,
+    stage_timer,
 )
 from . import task_manager as manager
 
 from fastapi import FastAPI, Path
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 app = FastAPI()
 
@@ -37,6 +51,22 @@ app.add_middleware(
 logging.basicConfig(level=api_resources.storage.logging_level)
 
 
+@app.on_event("startup")
+async def start_image_search_pool():
+    """Pre-warms the image search workers before the first request"""
+    async_process_controller.image_search_pool.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_image_search_pool():
+    async_process_controller.image_search_pool.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_ocr_engine():
+    ocr_engine.ocr_engine.close()
+
+
 @app.get("/")
 async def home():
     """Placeholder for home API"""
@@ -50,9 +80,48 @@ async def open_browser(url: str):
 
 
 @app.get("/get-actions/")
-async def get_actions():
-    """Gets all stored actions"""
-    return api_resources.storage.get_action_collection()
+async def get_actions(force_refresh: bool = False):
+    """Gets all stored actions from a snapshot that is at most
+    COLLECTION_SNAPSHOT_MAX_AGE seconds old unless a refresh is forced"""
+    return api_resources.storage.get_action_collection(force_refresh)
+
+
+def split_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Fields of a projection are given as a comma separated list"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+@app.get("/list-actions/")
+async def list_actions(
+    limit: int = api_resources.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    fields: str = None,
+    function: str = None,
+    id_prefix: str = None,
+):
+    """Lists one page of actions in id order.  The next_cursor of a page is
+    given as the cursor of the next request and fields limits the fields of
+    every action, for example fields=id,function."""
+    if not 0 < limit <= api_resources.MAX_PAGE_SIZE:
+        return {"data": f"Invalid limit: {limit}"}
+    return api_resources.storage.list_actions(
+        limit, cursor, split_fields(fields), function, id_prefix
+    )
+
+
+@app.get("/stream-actions/")
+def stream_actions(
+    fields: str = None, function: str = None, id_prefix: str = None
+):
+    """Streams the actions as newline delimited json while they are read"""
+    return StreamingResponse(
+        api_resources.storage.stream_actions(
+            split_fields(fields), function, id_prefix
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @app.get("/get-action/{action_id}")
@@ -66,15 +135,32 @@ async def get_action(
     return api_resources.storage.get_action(action_id)
 
 
+def validate_action(action: models.Action) -> Optional[dict]:
+    """Returns an error response when the image search or OCR settings of
+    an action are invalid"""
+    try:
+        action.validate_image_search_method()
+        action.validate_ocr_profile()
+        action.validate_ocr_mode()
+    except ValueError as ex:
+        return {"data": str(ex)}
+    return None
+
+
 @app.post("/add-action")
 async def add_action(new_action: models.Action):
     """Adds a new action to api_resources.storage"""
-    return api_resources.storage.add_action(new_action)
+    return validate_action(new_action) or api_resources.storage.add_action(
+        new_action
+    )
 
 
 @app.post("/add-execute-action")
 async def add_execute_action(new_action: models.Action):
     """Adds a new action to api_resources.storage"""
+    invalid_response = validate_action(new_action)
+    if invalid_response:
+        return invalid_response
     response = api_resources.storage.add_action(new_action)
     if isinstance(response, models.Action):
         execution = process_controller.process_action(response, False)
@@ -108,7 +194,9 @@ async def execute_action(
 @app.post("/update-action/{action_id}")
 async def update_action(action_id: str, new_action: models.Action):
     """Updates a previous action with new information"""
-    return api_resources.storage.update_action(action_id, new_action)
+    return validate_action(new_action) or api_resources.storage.update_action(
+        action_id, new_action
+    )
 
 
 @app.get("/delete-action/{action_id}")
@@ -118,9 +206,36 @@ async def delete_action(action_id: str):
 
 
 @app.get("/get-tasks")
-async def get_tasks():
-    """Gets all stored tasks"""
-    return api_resources.storage.get_task_collection()
+async def get_tasks(force_refresh: bool = False):
+    """Gets all stored tasks from a snapshot that is at most
+    COLLECTION_SNAPSHOT_MAX_AGE seconds old unless a refresh is forced"""
+    return api_resources.storage.get_task_collection(force_refresh)
+
+
+@app.get("/list-tasks/")
+async def list_tasks(
+    limit: int = api_resources.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    fields: str = None,
+    id_prefix: str = None,
+):
+    """Lists one page of tasks in id order like /list-actions/"""
+    if not 0 < limit <= api_resources.MAX_PAGE_SIZE:
+        return {"data": f"Invalid limit: {limit}"}
+    return api_resources.storage.list_tasks(
+        limit, cursor, split_fields(fields), id_prefix=id_prefix
+    )
+
+
+@app.get("/stream-tasks/")
+def stream_tasks(fields: str = None, id_prefix: str = None):
+    """Streams the tasks as newline delimited json while they are read"""
+    return StreamingResponse(
+        api_resources.storage.stream_tasks(
+            split_fields(fields), id_prefix=id_prefix
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 @app.get("/get-task/{task_id}")
@@ -211,9 +326,16 @@ async def screen_shot():
 
 
 @app.post("/screen-snip/{x1}/{y1}/{x2}/{y2}/")
-async def screen_snip(x1: int, y1: int, x2: int, y2: int, image: models.Image):
+async def screen_snip(
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    image: models.Image,
+    include_base64: bool = False,
+):
     """This function is used to capture a section of the screen and store in resources/images as png and json files"""
-    return process_controller.screen_snip(x1, y1, x2, y2, image)
+    return process_controller.screen_snip(x1, y1, x2, y2, image, include_base64)
 
 
 @app.get("/move-mouse/{x}/{y}")
@@ -240,11 +362,66 @@ async def keypress(key_id: str):
 
 
 @app.get("/capture-screen-data/{x1}/{y1}/{x2}/{y2}/{action_id}")
-def capture_screen_data(x1: int, y1: int, x2: int, y2: int, action_id: str):
+def capture_screen_data(
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    action_id: str,
+    ocr_profile: str = "default",
+    ocr_mode: str = "default",
+    ocr_whitelist: str = None,
+    glyph_set: str = None,
+):
     """This function captures data within the region within (x1, y1) and (x2, y2)"""
     if action_id == "-1":
         action_id = None
-    return process_controller.capture_screen_data(x1, y1, x2, y2, action_id)
+    if ocr_profile not in constants.OCR_PROFILES:
+        return {"data": f"Invalid ocr_profile: {ocr_profile}"}
+    if ocr_mode not in constants.OCR_MODES:
+        return {"data": f"Invalid ocr_mode: {ocr_mode}"}
+    return process_controller.capture_screen_data(
+        x1,
+        y1,
+        x2,
+        y2,
+        action_id,
+        ocr_profile=ocr_profile,
+        ocr_mode=ocr_mode,
+        ocr_whitelist=ocr_whitelist,
+        glyph_set=glyph_set,
+    )
+
+
+@app.post("/capture-screen-data-batch/")
+def capture_screen_data_batch(regions: List[models.CaptureRegion]):
+    """Captures several regions from one screenshot and reads them in
+    parallel.  Regions of an action use the coordinates and OCR settings of
+    the action unless they are given."""
+    for region in regions:
+        try:
+            region.validate_ocr_profile()
+            region.validate_ocr_mode()
+        except ValueError as ex:
+            return {"data": str(ex)}
+    return process_controller.capture_screen_data_batch(regions)
+
+
+@app.get("/get-screen-data/{screen_data_id}")
+async def get_screen_data(screen_data_id: str, include_base64: bool = False):
+    """Returns the screen data of a capture with all of its screen objects.
+    The screenshot is only added as a base 64 string when it is asked for."""
+    response = api_resources.storage.get_screen_data(
+        screen_data_id, include_base64
+    )
+    return response or {"data": f"Screen data not found: {screen_data_id}"}
+
+
+@app.get("/get-screen-object/{screen_obj_id}")
+async def get_screen_object(screen_obj_id: str):
+    """Returns a screen object by id"""
+    response = api_resources.storage.get_screen_object(screen_obj_id)
+    return response or {"data": f"Screen object not found: {screen_obj_id}"}
 
 
 @app.post("/fetch-all/")
@@ -259,3 +436,28 @@ async def fan_out(action_ids: List[str], instant_playback: bool):
             action_id, instant_playback=instant_playback
         )
     return {"data": "Created celery tasks"}
+
+
+@app.get("/cache-stats/")
+async def cache_stats():
+    """Hit and miss counters for the in-process caches"""
+    return {
+        "needle_cache": image_cache.needle_cache.stats(),
+        "search_hints": search_hints.hint_cache.stats(),
+        "conditional_cache": conditional_cache.conditional_cache.stats(),
+        "glyph_recognizer": glyph_recognizer.glyph_recognizer.stats(),
+        "ocr_cache": ocr_cache.ocr_cache.stats(),
+        "blob_store": blob_store.blob_store.stats(),
+    }
+
+
+@app.get("/stage-timings/")
+async def stage_timings():
+    """Count, mean and max duration of each stage of the timed pipelines"""
+    return stage_timer.stage_stats.stats()
+
+
+@app.get("/image-pool-health/")
+def image_pool_health():
+    """Pings the image search workers and restarts the pool if it is broken"""
+    return async_process_controller.image_search_pool.health_check()
@@ -0,0 +1,259 @@
+"""
+Glyph Recognizer
+    Reads fixed font counters and prices without tesseract by comparing each
+    character with glyph templates that were learned from labelled captures.
+        1. A captured region is binarized and split into glyphs at the
+            columns that have no foreground pixels
+        2. Every glyph is compared with every template of the glyph set in a
+            single matrix product of normalized vectors
+        3. Glyph sets are learned from ScreenData captures, stored as npz
+            files in resources/glyphs and cached in memory
+        4. No words are returned when a glyph is not confidently matched so
+            the caller can fall back to OCR
+"""
+import logging
+import os
+import threading
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from . import blob_store, models
+from .ocr_engine import OcrWord
+
+glyph_dir = models.resources_dir / "glyphs"
+GLYPH_MIN_CONFIDENCE = float(os.environ.get("GLYPH_MIN_CONFIDENCE", 0.8))
+TEMPLATE_HEIGHT = 16
+TEMPLATE_WIDTH = 12
+"""Glyphs are padded to this width to height ratio so narrow glyphs like 1
+keep their shape when they are resized to the template size"""
+CELL_ASPECT_RATIO = TEMPLATE_WIDTH / TEMPLATE_HEIGHT
+"""Glyph centers further apart than this many glyph widths separate words
+which works for narrow glyphs with wide spacing in fixed fonts"""
+WORD_PITCH_RATIO = 1.5
+
+
+class GlyphSet(NamedTuple):
+    chars: np.ndarray
+    templates: np.ndarray
+    max_width: int
+
+
+def binarize(image: np.ndarray) -> np.ndarray:
+    """Returns a boolean mask of the glyph pixels which are assumed to be
+    less common than the background pixels"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    mask = cv2.threshold(image, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    mask = mask.astype(bool)
+    if mask.sum() * 2 > mask.size:
+        mask = ~mask
+    return mask
+
+
+def segment_glyphs(
+    image: np.ndarray,
+) -> Tuple[np.ndarray, List[Tuple[int, int, int, int]]]:
+    """Splits a region into glyphs and returns a normalized vector for each
+    glyph with its (x, y, width, height) box"""
+    mask = binarize(image)
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return np.empty((0, TEMPLATE_HEIGHT * TEMPLATE_WIDTH)), []
+    line_y1, line_y2 = int(rows[0]), int(rows[-1]) + 1
+    line = mask[line_y1:line_y2]
+    line_height = line_y2 - line_y1
+
+    is_column = np.concatenate(([False], line.any(axis=0), [False]))
+    edges = np.flatnonzero(np.diff(is_column.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+
+    cell_width = max(int(round(line_height * CELL_ASPECT_RATIO)), 1)
+    vectors = []
+    boxes = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        glyph = line[:, start:end]
+        glyph_width = end - start
+        padding = max(cell_width - glyph_width, 0)
+        glyph = np.pad(
+            glyph, ((0, 0), (padding // 2, padding - padding // 2))
+        ).astype(np.float32)
+        vectors.append(
+            cv2.resize(
+                glyph,
+                (TEMPLATE_WIDTH, TEMPLATE_HEIGHT),
+                interpolation=cv2.INTER_AREA,
+            ).ravel()
+        )
+        boxes.append((start, line_y1, glyph_width, line_height))
+    return normalize(np.stack(vectors)), boxes
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Zero mean and unit length rows so a dot product is a correlation"""
+    vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+def learn_glyph_set(samples: List[Tuple[np.ndarray, str]]) -> GlyphSet:
+    """Averages the glyphs of every labelled sample into one template for
+    each character.  Samples that do not split into one glyph per character
+    are skipped."""
+    glyph_vectors = {}
+    max_width = 0
+    for image, text in samples:
+        chars = [char for char in text if not char.isspace()]
+        vectors, boxes = segment_glyphs(image)
+        if len(chars) != len(boxes):
+            logging.warning(f"Skipped sample '{text}' with {len(boxes)} glyphs")
+            continue
+        for char, vector, box in zip(chars, vectors, boxes):
+            glyph_vectors.setdefault(char, []).append(vector)
+            max_width = max(max_width, box[2])
+    if not glyph_vectors:
+        raise ValueError("No samples could be split into glyphs")
+    chars = sorted(glyph_vectors)
+    templates = normalize(
+        np.stack([np.mean(glyph_vectors[char], axis=0) for char in chars])
+    )
+    return GlyphSet(np.array(chars), templates, max_width)
+
+
+def load_screen_data_sample(
+    screen_data_id: str, text: Optional[str] = None
+) -> Tuple[np.ndarray, str]:
+    """Decodes the image of a ScreenData capture and labels it with the text
+    of its screen objects unless a text is given"""
+    screen_data = models.ScreenDataResource().get_screen_data(screen_data_id)
+    if screen_data is None:
+        raise ValueError(f"Screen data not found: {screen_data_id}")
+    png_bytes = blob_store.read_image_bytes(screen_data)
+    if png_bytes is None:
+        raise ValueError(f"Screen data has no image: {screen_data_id}")
+    image = cv2.imdecode(np.frombuffer(png_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if text is None:
+        text = " ".join(
+            screen_object.get("text", "")
+            for screen_object in screen_data.get("screen_objects", [])
+        )
+    return image, text
+
+
+class GlyphRecognizer:
+    """Decodes regions with the glyph sets stored in the glyph directory"""
+
+    def __init__(
+        self, min_confidence: float = GLYPH_MIN_CONFIDENCE, directory=glyph_dir
+    ):
+        self.min_confidence = min_confidence
+        self.directory = directory
+        self.reads = 0
+        self.fallbacks = 0
+        self._glyph_sets = {}
+        self._lock = threading.Lock()
+
+    def save_glyph_set(self, name: str, glyph_set: GlyphSet) -> None:
+        self.directory.mkdir(exist_ok=True)
+        np.savez(
+            self.directory / f"{name}.npz",
+            chars=glyph_set.chars,
+            templates=glyph_set.templates,
+            max_width=glyph_set.max_width,
+        )
+        with self._lock:
+            self._glyph_sets.pop(name, None)
+
+    def get_glyph_set_version(self, name: str) -> Optional[str]:
+        """Returns the modified time and size of the glyph set file which
+        change when the glyph set is learned again"""
+        try:
+            file_stat = os.stat(self.directory / f"{name}.npz")
+        except OSError:
+            return None
+        return f"{file_stat.st_mtime_ns}:{file_stat.st_size}"
+
+    def get_glyph_set(self, name: str) -> Optional[GlyphSet]:
+        """Returns the glyph set and loads it again when its file changed"""
+        file_path = self.directory / f"{name}.npz"
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            logging.debug(f"Glyph set does not exist: {name}")
+            return None
+        with self._lock:
+            cached = self._glyph_sets.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with np.load(file_path) as glyph_file:
+            glyph_set = GlyphSet(
+                glyph_file["chars"],
+                glyph_file["templates"],
+                int(glyph_file["max_width"]),
+            )
+        with self._lock:
+            self._glyph_sets[name] = (mtime, glyph_set)
+        return glyph_set
+
+    def recognize(
+        self, image: np.ndarray, glyph_set_name: str
+    ) -> Optional[List[OcrWord]]:
+        """Returns the words of the region or None when the glyph set does
+        not exist or a glyph is not matched with enough confidence"""
+        self.reads += 1
+        glyph_set = (
+            self.get_glyph_set(glyph_set_name) if glyph_set_name else None
+        )
+        if glyph_set is None:
+            self.fallbacks += 1
+            return None
+        vectors, boxes = segment_glyphs(image)
+        if not boxes:
+            return []
+        widths = np.array([box[2] for box in boxes])
+        scores = vectors @ glyph_set.templates.T
+        best = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(boxes)), best]
+        if (
+            confidences.min() < self.min_confidence
+            or widths.max() > glyph_set.max_width * 1.5
+        ):
+            self.fallbacks += 1
+            return None
+
+        chars = glyph_set.chars[best].tolist()
+        words = []
+        word_start = 0
+        for index in range(1, len(boxes) + 1):
+            if index < len(boxes):
+                previous_x, _, previous_width, _ = boxes[index - 1]
+                x, _, width, _ = boxes[index]
+                pitch = (x + width / 2) - (previous_x + previous_width / 2)
+                if pitch <= glyph_set.max_width * WORD_PITCH_RATIO:
+                    continue
+            word_x1, word_y1, _, word_height = boxes[word_start]
+            last_x, _, last_width, _ = boxes[index - 1]
+            words.append(
+                OcrWord(
+                    "".join(chars[word_start:index]),
+                    word_x1,
+                    word_y1,
+                    last_x + last_width - word_x1,
+                    word_height,
+                    float(confidences[word_start:index].min() * 100),
+                )
+            )
+            word_start = index
+        return words
+
+    def stats(self) -> dict:
+        return {
+            "glyph_sets": len(self._glyph_sets),
+            "reads": self.reads,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": self.fallbacks / self.reads if self.reads else 0.0,
+        }
+
+
+glyph_recognizer = GlyphRecognizer()
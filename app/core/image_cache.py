@@ -0,0 +1,118 @@
+"""
+Image Cache
+    In-process cache of decoded needle images used by the image search:
+        1. Needles are stored as grayscale arrays along with their width
+            and height so they only have to be decoded once
+        2. Entries are keyed by file path and modification time so an
+            overwritten needle file is decoded again
+        3. Least recently used needles are evicted when the memory cap is
+            reached
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+import cv2
+import numpy as np
+
+NEEDLE_CACHE_MAX_BYTES = int(
+    os.environ.get("NEEDLE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+
+
+class Needle(NamedTuple):
+    grayscale: np.ndarray
+    width: int
+    height: int
+
+
+def load_needle(file_path: Union[str, Path]) -> Optional[Needle]:
+    """Reads a needle image from disk and converts it to grayscale"""
+    needle = cv2.imread(str(file_path), cv2.IMREAD_UNCHANGED)
+    if needle is None:
+        logging.debug(f"Needle could not be read: {file_path}")
+        return None
+    if needle.ndim == 2:
+        grayscale_needle = needle
+    else:
+        grayscale_needle = cv2.cvtColor(needle, cv2.COLOR_BGR2GRAY)
+    return Needle(
+        grayscale=grayscale_needle,
+        width=int(needle.shape[1]),
+        height=int(needle.shape[0]),
+    )
+
+
+class NeedleCache:
+    """Least recently used cache of decoded needles that is capped by the
+    number of bytes held by the grayscale arrays"""
+
+    def __init__(self, max_bytes: int = NEEDLE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._needles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: Union[str, Path]) -> Optional[Needle]:
+        """Returns the cached needle or decodes it when the file is new or
+        has been modified since it was cached"""
+        file_path = str(file_path)
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            logging.debug(f"Needle does not exist: {file_path}")
+            return None
+
+        with self._lock:
+            cached = self._needles.get(file_path)
+            if cached and cached[0] == mtime:
+                self._needles.move_to_end(file_path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        needle = load_needle(file_path)
+        if needle is not None:
+            self._put(file_path, mtime, needle)
+        return needle
+
+    def _put(self, file_path: str, mtime: int, needle: Needle) -> None:
+        size = needle.grayscale.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._needles.pop(file_path, None)
+            if previous:
+                self.current_bytes -= previous[1].grayscale.nbytes
+            self._needles[file_path] = (mtime, needle)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._needles.popitem(last=False)
+                self.current_bytes -= evicted.grayscale.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._needles.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._needles),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+needle_cache = NeedleCache()
@@ -0,0 +1,306 @@
+"""
+Image Matching
+    Template matching engine used by the image search.  It only works with
+    decoded arrays and needle files so it can be imported by pool workers
+    without starting the xvfb virtual display.
+        1. Needle search - Find the best match of one needle within a
+            grayscale haystack with a single minMaxLoc check
+        2. All matches search - Find every distinct match of a needle by
+            extracting peaks and suppressing overlapping matches in NumPy
+        3. Batched search - Find several needles within one haystack that is
+            decoded and converted to grayscale once
+    Search methods
+        1. exact - Match the needle over the full resolution haystack
+        2. pyramid - Match a downscaled needle over a downscaled haystack and
+            refine the best candidates in small full resolution windows.  The
+            exact search is used when the coarse pass finds nothing.
+"""
+import logging
+from typing import List, NamedTuple, Optional, Union
+
+import cv2
+import numpy as np
+
+from . import image_cache, models
+from .constants import IMAGE_SEARCH_METHODS
+
+image_dir = models.resources_dir / "images"
+SEARCH_MODES = ("any", "all")
+PYRAMID_SCALE = 0.5
+PYRAMID_MIN_NEEDLE_SIZE = 8
+PYRAMID_COARSE_MARGIN = 0.2
+PYRAMID_MAX_CANDIDATES = 5
+
+
+class NeedleMatch(NamedTuple):
+    needle: str
+    x: float
+    y: float
+    score: float
+
+    @property
+    def found(self) -> bool:
+        return self.x != -1 and self.y != -1
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Converts a BGR or BGRA image to grayscale"""
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def load_grayscale_haystack(haystack_file_name: str) -> Optional[np.ndarray]:
+    """Reads a haystack image from the images directory as grayscale"""
+    haystack = cv2.imread(
+        str(image_dir / haystack_file_name), cv2.IMREAD_UNCHANGED
+    )
+    if haystack is None:
+        logging.debug(f"Haystack could not be read: {haystack_file_name}")
+        return None
+    return to_grayscale(haystack)
+
+
+def _match_template(
+    needle: image_cache.Needle, grayscale_haystack: np.ndarray
+) -> Optional[np.ndarray]:
+    haystack_height, haystack_width = grayscale_haystack.shape[:2]
+    if needle.width > haystack_width or needle.height > haystack_height:
+        return None
+    return cv2.matchTemplate(
+        grayscale_haystack, needle.grayscale, cv2.TM_CCOEFF_NORMED
+    )
+
+
+def match_needle(
+    needle: image_cache.Needle,
+    grayscale_haystack: np.ndarray,
+    percent_similarity: float = 0.9,
+) -> NeedleMatch:
+    """Search for a decoded needle in a grayscale haystack and return the
+    center (x, y) coords of the best match with its score"""
+    result = _match_template(needle, grayscale_haystack)
+    if result is None:
+        return NeedleMatch("", -1, -1, 0.0)
+    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+    """Max location has the best match with max_val to be % accuracy"""
+    if max_val < percent_similarity:
+        logging.debug("There are no matches.")
+        return NeedleMatch("", -1, -1, float(max_val))
+    center_x = max_loc[0] + needle.width / 2
+    center_y = max_loc[1] + needle.height / 2
+    return NeedleMatch("", center_x, center_y, float(max_val))
+
+
+def match_needle_all(
+    needle: image_cache.Needle,
+    grayscale_haystack: np.ndarray,
+    percent_similarity: float = 0.9,
+    max_overlap: float = 0.2,
+    max_matches: Optional[int] = None,
+) -> List[NeedleMatch]:
+    """Search for every distinct match of a decoded needle in a grayscale
+    haystack.  Matches are sorted by score and any match that overlaps a
+    better match by more than max_overlap (intersection over union) is
+    suppressed."""
+    result = _match_template(needle, grayscale_haystack)
+    if result is None:
+        return []
+    result = np.nan_to_num(result, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    """Only keep peaks that are the best score within half a needle"""
+    kernel = np.ones(
+        (max(needle.height // 2, 1), max(needle.width // 2, 1)), np.uint8
+    )
+    is_peak = (result >= percent_similarity) & (
+        result >= cv2.dilate(result, kernel)
+    )
+    yloc, xloc = np.nonzero(is_peak)
+    if len(xloc) == 0:
+        logging.debug("There are no matches.")
+        return []
+    scores = result[yloc, xloc]
+    order = np.argsort(-scores, kind="stable")
+    xloc, yloc, scores = xloc[order], yloc[order], scores[order]
+
+    width, height = needle.width, needle.height
+    area = width * height
+    keep = []
+    remaining = np.arange(len(xloc))
+    while remaining.size:
+        best = remaining[0]
+        keep.append(best)
+        if max_matches and len(keep) >= max_matches:
+            break
+        others = remaining[1:]
+        overlap_width = np.clip(
+            width - np.abs(xloc[others] - xloc[best]), 0, None
+        )
+        overlap_height = np.clip(
+            height - np.abs(yloc[others] - yloc[best]), 0, None
+        )
+        intersection = overlap_width * overlap_height
+        iou = intersection / (2 * area - intersection)
+        remaining = others[iou <= max_overlap]
+
+    keep = np.asarray(keep)
+    return [
+        NeedleMatch("", x + width / 2, y + height / 2, float(score))
+        for x, y, score in zip(
+            xloc[keep].tolist(), yloc[keep].tolist(), scores[keep].tolist()
+        )
+    ]
+
+
+def match_needle_pyramid(
+    needle: image_cache.Needle,
+    grayscale_haystack: np.ndarray,
+    percent_similarity: float = 0.9,
+    scale: float = PYRAMID_SCALE,
+    max_candidates: int = PYRAMID_MAX_CANDIDATES,
+) -> NeedleMatch:
+    """Coarse to fine search for a decoded needle.  Candidates from the
+    downscaled match are refined at full resolution within a window of a
+    few pixels around each candidate."""
+    if min(needle.width, needle.height) * scale < PYRAMID_MIN_NEEDLE_SIZE:
+        return match_needle(needle, grayscale_haystack, percent_similarity)
+    coarse_grayscale_needle = cv2.resize(
+        needle.grayscale,
+        None,
+        fx=scale,
+        fy=scale,
+        interpolation=cv2.INTER_AREA,
+    )
+    coarse_needle = image_cache.Needle(
+        grayscale=coarse_grayscale_needle,
+        width=coarse_grayscale_needle.shape[1],
+        height=coarse_grayscale_needle.shape[0],
+    )
+    coarse_haystack = cv2.resize(
+        grayscale_haystack,
+        None,
+        fx=scale,
+        fy=scale,
+        interpolation=cv2.INTER_AREA,
+    )
+    candidates = match_needle_all(
+        coarse_needle,
+        coarse_haystack,
+        percent_similarity - PYRAMID_COARSE_MARGIN,
+        max_matches=max_candidates,
+    )
+
+    haystack_height, haystack_width = grayscale_haystack.shape[:2]
+    padding = int(np.ceil(2 / scale))
+    best_match = None
+    for candidate in candidates:
+        x1 = int((candidate.x - coarse_needle.width / 2) / scale) - padding
+        y1 = int((candidate.y - coarse_needle.height / 2) / scale) - padding
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2 = min(x1 + needle.width + 2 * padding, haystack_width)
+        y2 = min(y1 + needle.height + 2 * padding, haystack_height)
+        match = match_needle(
+            needle, grayscale_haystack[y1:y2, x1:x2], percent_similarity
+        )
+        if match.found and (
+            best_match is None or match.score > best_match.score
+        ):
+            best_match = match._replace(x=match.x + x1, y=match.y + y1)
+
+    if best_match is None:
+        logging.debug("Pyramid search found no match, using exact search.")
+        return match_needle(needle, grayscale_haystack, percent_similarity)
+    return best_match
+
+
+def find_needle(
+    needle_file_name: str,
+    grayscale_haystack: np.ndarray,
+    percent_similarity: float = 0.9,
+    method: str = "exact",
+) -> NeedleMatch:
+    """Search for a needle file from the images directory"""
+    if method not in IMAGE_SEARCH_METHODS:
+        raise ValueError(f"Invalid image search method: {method}")
+    needle = image_cache.needle_cache.get(image_dir / needle_file_name)
+    if needle is None:
+        return NeedleMatch(needle_file_name, -1, -1, 0.0)
+    if method == "pyramid":
+        match = match_needle_pyramid(
+            needle, grayscale_haystack, percent_similarity
+        )
+    else:
+        match = match_needle(needle, grayscale_haystack, percent_similarity)
+    return match._replace(needle=needle_file_name)
+
+
+def image_search_all(
+    needle_file_name: str,
+    haystack: Union[str, np.ndarray],
+    percent_similarity: float = 0.9,
+    max_overlap: float = 0.2,
+    max_matches: Optional[int] = None,
+) -> List[NeedleMatch]:
+    """Search for every distinct match of a needle file from the images
+    directory within a haystack file or array"""
+    if isinstance(haystack, str):
+        grayscale_haystack = load_grayscale_haystack(haystack)
+    else:
+        grayscale_haystack = to_grayscale(haystack)
+    needle = image_cache.needle_cache.get(image_dir / needle_file_name)
+    if needle is None or grayscale_haystack is None:
+        return []
+    return [
+        match._replace(needle=needle_file_name)
+        for match in match_needle_all(
+            needle,
+            grayscale_haystack,
+            percent_similarity,
+            max_overlap,
+            max_matches,
+        )
+    ]
+
+
+def image_search_many(
+    needle_file_names: List[str],
+    haystack: Union[str, np.ndarray],
+    percent_similarity: float = 0.9,
+    mode: str = "any",
+    method: str = "exact",
+) -> dict:
+    """Search for several needles in one haystack which is only decoded and
+    converted to grayscale once.  With the 'any' mode the search stops at the
+    first needle found and with the 'all' mode it stops at the first needle
+    that is missing.  Needles that were not searched are left out of the
+    matches."""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Invalid search mode: {mode}")
+    if isinstance(haystack, str):
+        grayscale_haystack = load_grayscale_haystack(haystack)
+    else:
+        grayscale_haystack = to_grayscale(haystack)
+
+    matches = []
+    if grayscale_haystack is not None:
+        for needle_file_name in needle_file_names:
+            match = find_needle(
+                needle_file_name, grayscale_haystack, percent_similarity, method
+            )
+            matches.append(match)
+            if mode == "any" and match.found:
+                break
+            if mode == "all" and not match.found:
+                break
+
+    if mode == "any":
+        result = any(match.found for match in matches)
+    else:
+        result = len(matches) == len(needle_file_names) and all(
+            match.found for match in matches
+        )
+    return {
+        "result": result,
+        "matches": [match._asdict() for match in matches],
+    }
@@ -4,6 +4,7 @@ Models:
         - Actions - All actions that can be executed by the process controller
         - Tasks - An ordered collection of actions to execute with a configuration
         - Screen Objects - Screen objects represent text, buttons, or GUI elements
+        - Capture Region - A region of a batch capture of screen data
         - Image - An image from the xvfb virtual display
         - Json Data - Abstract object for storing JSON data
         - Source - Represents an abstract data source stored in the file system
@@ -14,25 +15,56 @@ Models:
             coordinates for different resolutions
     JSON resources
         - All CRUD operations for utilizing single json files
+        - Files are written in the RESOURCE_FORMAT of the serializers and
+            read in any format
+    Screen data resources
+        - Bulk storage of the screen data and screen objects of a capture
     JSON collection resources
         - All CRUD operations for utilizing collections of json files
+        - An in-memory index of the ids for cheap existence checks
+        - An in-memory snapshot of the collection that only reads the files
+            that changed since the last refresh
+        - Listings in id order that start after a cursor id
+    SQLite collection resources
+        - The same CRUD operations for collections stored in an embedded
+            SQLite database in WAL mode
 """
+import bisect
 import datetime
+import itertools
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
 import uuid
 from pathlib import Path
-from typing import List, Optional, Any, Union
+from typing import List, Optional, Any, Iterator, Tuple, Union
 
 from pydantic import BaseModel, validators
 from pydantic.types import Json
 
-from core.constants import ACTIONS, CONDITIONALS, RESULTS
+from core import serializers
+from core.constants import (
+    ACTIONS,
+    CONDITIONALS,
+    IMAGE_SEARCH_METHODS,
+    OCR_MODES,
+    OCR_PROFILES,
+    RESULTS,
+)
 
 base_dir = Path(".").absolute()
 resources_dir = base_dir / "resources"
 if not resources_dir.is_dir():
     resources_dir = base_dir / "core" / "resources"
+"""Seconds that the collection snapshot of get_all_collections can be
+behind the files that are written by other processes"""
+COLLECTION_SNAPSHOT_MAX_AGE = float(
+    os.environ.get("COLLECTION_SNAPSHOT_MAX_AGE", 1.0)
+)
+SQLITE_ITER_BATCH_SIZE = 500
 logging.basicConfig(level=logging.DEBUG)
 
 
@@ -69,6 +101,11 @@ class Action(BaseModel):
     random_path: Optional[bool] = False
     random_range: Optional[int] = 0
     random_delay: Optional[float] = 0.0
+    image_search_method: Optional[str] = "exact"
+    ocr_profile: Optional[str] = "default"
+    ocr_mode: Optional[str] = "default"
+    ocr_whitelist: Optional[str] = None
+    glyph_set: Optional[str] = None
 
     def validate_function(self):
         if self.function not in ACTIONS:
@@ -102,6 +139,20 @@ class Action(BaseModel):
         if self.sleep_duration < 0:
             raise ValueError(f"Invalid sleep_duration: {self.sleep_duration}")
 
+    def validate_image_search_method(self):
+        if self.image_search_method not in IMAGE_SEARCH_METHODS:
+            raise ValueError(
+                f"Invalid image_search_method: {self.image_search_method}"
+            )
+
+    def validate_ocr_profile(self):
+        if self.ocr_profile not in OCR_PROFILES:
+            raise ValueError(f"Invalid ocr_profile: {self.ocr_profile}")
+
+    def validate_ocr_mode(self):
+        if self.ocr_mode not in OCR_MODES:
+            raise ValueError(f"Invalid ocr_mode: {self.ocr_mode}")
+
 
 class Task(BaseModel):
     """Tasks represent a collection of actions that complete a goal or objective"""
@@ -134,18 +185,46 @@ class ScreenObject(ExtendedBaseModel):
 
 class ScreenData(ExtendedBaseModel):
     """Screen data is a collection for all the screen objects found and the
-    screenshot is saved as a base 64 image. This is used to compare screen
-    objects to the screen data to determine if an action should be executed"""
+    screenshot is stored as a blob that is referenced by its blob id. This is
+    used to compare screen objects to the screen data to determine if an
+    action should be executed"""
 
     id: Optional[str] = str(uuid.uuid4())
     timestamp: Optional[str] = datetime.datetime.now().isoformat()
-    base64str: str
+    base64str: Optional[str] = None
+    blob_id: Optional[str] = None
     screen_obj_ids: List[str]
 
 
+class CaptureRegion(BaseModel):
+    """A region of a batch capture of screen data.  The coordinates and OCR
+    settings that are not given are taken from the capture_screen_data
+    action of the region."""
+
+    action_id: Optional[str] = None
+    x1: Optional[int] = None
+    y1: Optional[int] = None
+    x2: Optional[int] = None
+    y2: Optional[int] = None
+    ocr_profile: Optional[str] = None
+    ocr_mode: Optional[str] = None
+    ocr_whitelist: Optional[str] = None
+    glyph_set: Optional[str] = None
+
+    def validate_ocr_profile(self):
+        if self.ocr_profile and self.ocr_profile not in OCR_PROFILES:
+            raise ValueError(f"Invalid ocr_profile: {self.ocr_profile}")
+
+    def validate_ocr_mode(self):
+        if self.ocr_mode and self.ocr_mode not in OCR_MODES:
+            raise ValueError(f"Invalid ocr_mode: {self.ocr_mode}")
+
+
 class Image(ExtendedBaseModel):
-    """Represents any picture image that needs to be stored via a 64 bit
-    encoding to be used for comparison or other purposes in the process controller"""
+    """Represents any picture image that is stored as a blob to be used for
+    comparison or other purposes in the process controller.  Images can be
+    sent to the API as a base 64 string.
+    """
 
     id: Optional[str] = str(uuid.uuid4())
     width: Optional[int] = 1920
@@ -156,7 +235,8 @@ class Image(ExtendedBaseModel):
     y1: Optional[int] = 0
     x2: Optional[int] = 1920
     y2: Optional[int] = 1920
-    base64str: str
+    base64str: Optional[str] = None
+    blob_id: Optional[str] = None
 
 
 class AsyncRequest(BaseModel):
@@ -229,9 +309,8 @@ class JsonResource:
         file_name = f"{self.obj.id}.json"
         file_path = self.obj_dir / file_name
         response = {"data": f"Saved: {file_name}"}
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(self.obj.dict(), file, indent=6)
-            logging.debug(response)
+        serializers.dump_file(self.obj.dict(), file_path)
+        logging.debug(response)
         return response
 
     def load_resource(self) -> dict:
@@ -240,9 +319,8 @@ class JsonResource:
         response = {"data": f"Loaded: {file_name}"}
         obj_json = None
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                obj_json = json.loads(file.read())
-                logging.debug(obj_json)
+            obj_json = serializers.load_file(file_path)
+            logging.debug(obj_json)
         except OSError:
             response = {"data": f"File does not exist: {file_path}"}
             logging.debug(response)
@@ -260,6 +338,184 @@ class JsonResource:
         return response
 
 
+class ScreenDataResource:
+    """Stores the screen data of a capture together with all of its screen
+    objects in a single json file.  Screen object ids are made of the screen
+    data id and their position so the file of a screen object is found from
+    its id.  Captures with other screen object ids append one line to an
+    index of their screen object ids instead and screen objects that were
+    stored in their own file before are still read."""
+
+    def __init__(self, testing=False):
+        test_dir = "test_" if testing else ""
+        self.data_dir = resources_dir / f"{test_dir}screen_data"
+        self.data_dir.mkdir(exist_ok=True)
+        self.index_path = self.data_dir / "screen_object_index.jsonl"
+        self._screen_data_ids = {}
+        self._index_offset = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def screen_object_id(screen_data_id: str, index: int) -> str:
+        return f"{screen_data_id}-{index}"
+
+    def _is_indexed(self, screen_data: ScreenData) -> bool:
+        """Only captures whose screen object ids can not be derived from the
+        screen data id are added to the index"""
+        return screen_data.screen_obj_ids != [
+            self.screen_object_id(screen_data.id, index)
+            for index in range(len(screen_data.screen_obj_ids))
+        ]
+
+    def _read_index(self) -> None:
+        """Reads the index lines that were appended since the last read which
+        includes captures stored by other processes"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                file.seek(self._index_offset)
+                for line in iter(file.readline, ""):
+                    if not line.endswith("\n"):
+                        break
+                    self._index_offset += len(line.encode("utf-8"))
+                    entry = json.loads(line)
+                    for screen_obj_id in entry["screen_obj_ids"]:
+                        self._screen_data_ids[screen_obj_id] = entry["id"]
+        except OSError:
+            pass
+
+    def store_resource(
+        self, screen_data: ScreenData, screen_objects: List[ScreenObject]
+    ) -> dict:
+        return self.store_resources([(screen_data, screen_objects)])
+
+    def store_resources(
+        self, captures: List[Tuple[ScreenData, List[ScreenObject]]]
+    ) -> dict:
+        """Stores the screen data of several captures and appends their
+        index lines in a single write"""
+        file_names = [f"{screen_data.id}.json" for screen_data, _ in captures]
+        response = {"data": f"Saved: {', '.join(file_names)}"}
+        index_lines = []
+        try:
+            for file_name, (screen_data, screen_objects) in zip(
+                file_names, captures
+            ):
+                screen_data_json = screen_data.dict()
+                screen_data_json["screen_objects"] = [
+                    screen_object.dict() for screen_object in screen_objects
+                ]
+                serializers.dump_file(
+                    screen_data_json,
+                    self.data_dir / file_name,
+                    serializers.SCREEN_DATA_FORMAT,
+                )
+                if not self._is_indexed(screen_data):
+                    continue
+                index_line = json.dumps(
+                    {
+                        "id": screen_data.id,
+                        "screen_obj_ids": screen_data.screen_obj_ids,
+                    }
+                )
+                index_lines.append(f"{index_line}\n")
+            if index_lines:
+                with self._lock:
+                    with open(self.index_path, "a", encoding="utf-8") as file:
+                        file.write("".join(index_lines))
+                    for screen_data, _ in captures:
+                        if not self._is_indexed(screen_data):
+                            continue
+                        for screen_obj_id in screen_data.screen_obj_ids:
+                            self._screen_data_ids[screen_obj_id] = (
+                                screen_data.id
+                            )
+        except OSError:
+            response = {"data": f"Error saving: {', '.join(file_names)}"}
+        logging.debug(response)
+        return response
+
+    def get_screen_data(self, screen_data_id: str) -> Optional[dict]:
+        """Returns the screen data with its screen objects"""
+        file_path = self.data_dir / f"{screen_data_id}.json"
+        try:
+            return serializers.load_file(file_path)
+        except OSError:
+            logging.debug({"data": f"File does not exist: {file_path}"})
+            return None
+
+    def get_screen_data_id(self, screen_obj_id: str) -> Optional[str]:
+        screen_data_id, _, index = screen_obj_id.rpartition("-")
+        if (
+            index.isdigit()
+            and (self.data_dir / f"{screen_data_id}.json").is_file()
+        ):
+            return screen_data_id
+        with self._lock:
+            if screen_obj_id not in self._screen_data_ids:
+                self._read_index()
+            return self._screen_data_ids.get(screen_obj_id)
+
+    def get_screen_object(self, screen_obj_id: str) -> Optional[dict]:
+        screen_data_id = self.get_screen_data_id(screen_obj_id)
+        if screen_data_id is not None:
+            screen_data = self.get_screen_data(screen_data_id) or {}
+            for screen_object in screen_data.get("screen_objects", []):
+                if screen_object.get("id") == screen_obj_id:
+                    return screen_object
+        """Screen objects that were stored in their own file"""
+        screen_object = self.get_screen_data(screen_obj_id)
+        if screen_object is None or "screen_obj_ids" in screen_object:
+            return None
+        return screen_object
+
+    def _compact_index(self, screen_data_id: str) -> None:
+        """Drops the screen objects of deleted screen data from the index and
+        rewrites the index without its lines"""
+        with self._lock:
+            self._read_index()
+            deleted_ids = [
+                screen_obj_id
+                for screen_obj_id, indexed_id in self._screen_data_ids.items()
+                if indexed_id == screen_data_id
+            ]
+            if not deleted_ids:
+                return
+            for screen_obj_id in deleted_ids:
+                del self._screen_data_ids[screen_obj_id]
+            temp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as file:
+                    """A line that another process is still writing is
+                    kept at the end and read once it is complete"""
+                    index_lines = [
+                        line
+                        for line in file
+                        if not line.endswith("\n")
+                        or json.loads(line)["id"] != screen_data_id
+                    ]
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    file.write("".join(index_lines))
+                os.replace(temp_path, self.index_path)
+                self._index_offset = sum(
+                    len(line.encode("utf-8"))
+                    for line in index_lines
+                    if line.endswith("\n")
+                )
+            except OSError as ex:
+                logging.debug(ex)
+
+    def delete_resource(self, screen_data_id: str) -> dict:
+        file_path = self.data_dir / f"{screen_data_id}.json"
+        response = {"data": f"Deleted: {file_path}"}
+        try:
+            file_path.unlink()
+        except OSError:
+            response = {"data": f"File does not exist: {file_path}"}
+        self._compact_index(screen_data_id)
+        logging.debug(response)
+        return response
+
+
 class JsonCollectionResource:
     """Abstract class for storing collections of json resources in the file
     system"""
@@ -271,15 +527,64 @@ class JsonCollectionResource:
             resources_dir / f"{test_dir}{self.model_to_str()}s"
         )
         self.collection_dir.mkdir(exist_ok=True)
+        self._ids = None
+        self._ids_lock = threading.Lock()
+        self._snapshot = {}
+        self._snapshot_ids = []
+        self._snapshot_refreshed_at = None
+        self._snapshot_writes = 0
+        self._snapshot_lock = threading.Lock()
+        self._writes = 0
 
     def model_to_str(self) -> str:
         return {Action: "action", Task: "task"}.get(self.model_cls)
 
+    def get_ids(self) -> set:
+        """Index of the ids in the collection which is read from the
+        directory once and kept up to date by add, update and delete.  Ids
+        that were deleted by another process are dropped when has_collection
+        finds that their file is gone."""
+        with self._ids_lock:
+            if self._ids is None:
+                self._ids = {
+                    file_path.name.replace(".json", "")
+                    for file_path in self.collection_dir.iterdir()
+                }
+            return self._ids
+
+    def has_collection(self, obj_id: str) -> bool:
+        """Checks that the file of the id exists and updates the id index
+        with ids that were added or deleted by another process"""
+        if obj_id is None:
+            return False
+        obj_id = str(obj_id)
+        ids = self.get_ids()
+        is_file = (self.collection_dir / f"{obj_id}.json").is_file()
+        if is_file != (obj_id in ids):
+            with self._ids_lock:
+                if is_file:
+                    ids.add(obj_id)
+                else:
+                    ids.discard(obj_id)
+        return is_file
+
+    def _index_add(self, obj_id: str) -> None:
+        with self._ids_lock:
+            if self._ids is not None:
+                self._ids.add(str(obj_id))
+        """Writes of this process are seen by the next snapshot read"""
+        self._writes += 1
+
+    def _index_discard(self, obj_id: str) -> None:
+        with self._ids_lock:
+            if self._ids is not None:
+                self._ids.discard(str(obj_id))
+        self._writes += 1
+
     def get_collection(self, obj_id: str) -> dict:
         try:
             file_path = self.collection_dir / f"{obj_id}.json"
-            with open(file_path, mode="r", encoding="utf-8") as f:
-                obj = json.load(f)
+            obj = serializers.load_file(file_path)
             response = obj
             logging.debug(response)
         except OSError:
@@ -287,20 +592,27 @@ class JsonCollectionResource:
             logging.debug(response)
         return response
 
+    def _create_file(self, obj: Union[Action, Task], next_id) -> None:
+        """Creates the file of an id that is not in use.  The file is opened
+        with an exclusive create so writers in other processes can not claim
+        the same id and next_id gives the id to try after a collision."""
+        while True:
+            file_path = self.collection_dir / f"{obj.id}.json"
+            try:
+                serializers.dump_file(obj.dict(), file_path, exclusive=True)
+                break
+            except FileExistsError:
+                self._index_add(obj.id)
+                obj.id = next_id()
+        self._index_add(obj.id)
+
     def add_collection(
         self, obj: Union[Action, Task, dict]
     ) -> Union[Action, Task]:
         try:
             if not isinstance(obj, self.model_cls):
                 obj = self.model_cls(**obj)
-            ids = [
-                file_path.name for file_path in self.collection_dir.iterdir()
-            ]
-            while f"{obj.id}.json" in ids:
-                obj.id = str(uuid.uuid4())
-            file_path = self.collection_dir / f"{obj.id}.json"
-            with open(file_path, mode="w", encoding="utf-8") as f:
-                json.dump(obj.dict(), f, indent=6)
+            self._create_file(obj, lambda: str(uuid.uuid4()))
             response = obj
             logging.debug(response)
         except OSError:
@@ -313,18 +625,20 @@ class JsonCollectionResource:
     ) -> Union[Action, Task]:
         response = {f"Error adding {self.model_to_str()} with id: {obj.id}"}
         try:
-            ids = [filename for filename in self.collection_dir.iterdir()]
-            if type(obj) is not Action:
-                counter = 1
-                while f"{obj.id}.json" in ids:
-                    obj.id = f"{obj.id}-{counter}"
-                    counter += 1
-            file_path = self.collection_dir / f"{obj.id}.json"
-            with open(file_path, mode="w", encoding="utf-8") as f:
-                json.dump(obj.dict(), f, indent=6)
+            if type(obj) is not Action and obj.id != obj_id:
+                """A task that is given a new id does not overwrite another
+                task with that id and gets a numbered id instead"""
+                counter = itertools.count(1)
+                base_id = obj.id
+                self._create_file(obj, lambda: f"{base_id}-{next(counter)}")
+            else:
+                file_path = self.collection_dir / f"{obj.id}.json"
+                serializers.dump_file(obj.dict(), file_path)
+                self._index_add(obj.id)
             if obj_id != obj.id:
-                old_file_path = self.collection_dir / obj_id
+                old_file_path = self.collection_dir / f"{obj_id}.json"
                 old_file_path.unlink(missing_ok=True)
+                self._index_discard(obj_id)
             response = obj
             logging.debug(f"Updated {self.model_to_str()} with id: {obj.id}")
         except OSError:
@@ -332,20 +646,308 @@ class JsonCollectionResource:
             logging.debug(response)
         return response
 
-    def get_all_collections(self):
-        return {
-            file_path.name.replace(".json", ""): json.load(open(file_path))
-            for file_path in self.collection_dir.iterdir()
-        }
+    def refresh_snapshot(self) -> None:
+        """Reads the files that were added or changed since the last refresh
+        by comparing their mtime and size and drops the deleted files.  A
+        file that can not be parsed yet because another process is writing
+        it keeps its previous version and is read again on the next
+        refresh."""
+        with self._snapshot_lock:
+            refreshed_at = time.monotonic()
+            writes = self._writes
+            snapshot = {}
+            with os.scandir(self.collection_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    obj_id = entry.name[: -len(".json")]
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    version = (stat.st_mtime_ns, stat.st_size)
+                    cached = self._snapshot.get(obj_id)
+                    if cached and cached[0] == version:
+                        snapshot[obj_id] = cached
+                        continue
+                    try:
+                        obj = serializers.load_file(entry.path)
+                        snapshot[obj_id] = (version, obj)
+                    except (OSError, ValueError):
+                        logging.debug(f"Could not read: {entry.path}")
+                        if cached:
+                            snapshot[obj_id] = (None, cached[1])
+            self._snapshot = snapshot
+            self._snapshot_ids = sorted(snapshot)
+            self._snapshot_refreshed_at = refreshed_at
+            self._snapshot_writes = writes
+
+    def refresh_stale_snapshot(self, force_refresh: bool = False) -> None:
+        """Refreshes the snapshot when it is older than the maximum snapshot
+        age, after a write of this process or when a refresh is forced"""
+        refreshed_at = self._snapshot_refreshed_at
+        if (
+            force_refresh
+            or refreshed_at is None
+            or self._writes != self._snapshot_writes
+            or time.monotonic() - refreshed_at > COLLECTION_SNAPSHOT_MAX_AGE
+        ):
+            self.refresh_snapshot()
+
+    def get_all_collections(self, force_refresh: bool = False) -> dict:
+        """Returns every resource of the collection from an in-memory
+        snapshot that is refreshed when it is stale.  The returned resources
+        are shared with the snapshot and should not be modified."""
+        self.refresh_stale_snapshot(force_refresh)
+        return {obj_id: obj for obj_id, (_, obj) in self._snapshot.items()}
+
+    def iter_collections(
+        self,
+        after_id: Optional[str] = None,
+        id_prefix: Optional[str] = None,
+        function: Optional[str] = None,
+    ) -> Iterator[Tuple[str, dict]]:
+        """Yields the resources of the snapshot in id order starting after
+        an id which is used as the cursor of paginated listings"""
+        self.refresh_stale_snapshot()
+        snapshot, ids = self._snapshot, self._snapshot_ids
+        start = bisect.bisect_right(ids, after_id) if after_id else 0
+        if id_prefix:
+            start = max(start, bisect.bisect_left(ids, id_prefix))
+        for index in range(start, len(ids)):
+            obj_id = ids[index]
+            if id_prefix and not obj_id.startswith(id_prefix):
+                break
+            cached = snapshot.get(obj_id)
+            if cached is None:
+                continue
+            obj = cached[1]
+            if function and obj.get("function") != function:
+                continue
+            yield obj_id, obj
 
     def delete_collection(self, obj_id: str) -> dict:
         response = {"data": f"Deleted {self.model_to_str()} with id: {obj_id}"}
         try:
             file_path = self.collection_dir / f"{obj_id}.json"
             file_path.unlink()
+            self._index_discard(obj_id)
         except FileNotFoundError:
+            self._index_discard(obj_id)
             response = {
                 "data": f"{self.model_to_str()} does not exist: {obj_id}"
             }
         logging.debug(response)
         return response
+
+
+class SqliteCollectionResource:
+    """Stores collections of json resources in an embedded SQLite database
+    with the same interface as JsonCollectionResource.  The database runs in
+    WAL mode so the API and the celery workers can read while one of them
+    writes."""
+
+    def __init__(self, model_cls, testing=False, db_path: Path = None):
+        self.model_cls = model_cls
+        test_dir = "test_" if testing else ""
+        self.collection_dir = (
+            resources_dir / f"{test_dir}{self.model_to_str()}s"
+        )
+        self.db_path = db_path or resources_dir / f"{test_dir}collections.db"
+        self.table = self.model_to_str()
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+
+    def model_to_str(self) -> str:
+        return {Action: "action", Task: "task"}.get(self.model_cls)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connections can not be shared between threads or with a forked
+        process so one is opened for each thread of each process"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get_ids(self) -> set:
+        rows = self._connect().execute(f"SELECT id FROM {self.table}")
+        return {obj_id for obj_id, in rows}
+
+    def has_collection(self, obj_id: str) -> bool:
+        if obj_id is None:
+            return False
+        row = (
+            self._connect()
+            .execute(f"SELECT 1 FROM {self.table} WHERE id = ?", (str(obj_id),))
+            .fetchone()
+        )
+        return row is not None
+
+    def get_collection(self, obj_id: str) -> dict:
+        row = (
+            self._connect()
+            .execute(
+                f"SELECT data FROM {self.table} WHERE id = ?", (str(obj_id),)
+            )
+            .fetchone()
+        )
+        if row is None:
+            response = {"data": f"{self.model_to_str()} not found."}
+        else:
+            response = json.loads(row[0])
+        logging.debug(response)
+        return response
+
+    def _insert_row(
+        self, connection: sqlite3.Connection, obj: Union[Action, Task], next_id
+    ) -> None:
+        """Inserts the row of an id that is not in use and next_id gives the
+        id to try after a collision like JsonCollectionResource._create_file"""
+        while True:
+            try:
+                connection.execute(
+                    f"INSERT INTO {self.table} (id, data) VALUES (?, ?)",
+                    (obj.id, json.dumps(obj.dict())),
+                )
+                break
+            except sqlite3.IntegrityError:
+                obj.id = next_id()
+
+    def add_collection(
+        self, obj: Union[Action, Task, dict]
+    ) -> Union[Action, Task]:
+        if not isinstance(obj, self.model_cls):
+            obj = self.model_cls(**obj)
+        try:
+            with self._connect() as connection:
+                self._insert_row(connection, obj, lambda: str(uuid.uuid4()))
+            response = obj
+            logging.debug(response)
+        except sqlite3.Error:
+            response = {f"Error adding {self.model_to_str()} with id: {obj.id}"}
+            logging.debug(response)
+        return response
+
+    def update_collection(
+        self, obj_id: str, obj: Union[Action, Task]
+    ) -> Union[Action, Task]:
+        try:
+            with self._connect() as connection:
+                if type(obj) is not Action and obj.id != obj_id:
+                    """A task that is given a new id does not overwrite
+                    another task with that id and gets a numbered id instead
+                    which is the same as in JsonCollectionResource"""
+                    counter = itertools.count(1)
+                    base_id = obj.id
+                    self._insert_row(
+                        connection, obj, lambda: f"{base_id}-{next(counter)}"
+                    )
+                else:
+                    connection.execute(
+                        f"INSERT OR REPLACE INTO {self.table} (id, data) "
+                        "VALUES (?, ?)",
+                        (obj.id, json.dumps(obj.dict())),
+                    )
+                if str(obj_id) != obj.id:
+                    connection.execute(
+                        f"DELETE FROM {self.table} WHERE id = ?", (str(obj_id),)
+                    )
+            response = obj
+            logging.debug(f"Updated {self.model_to_str()} with id: {obj.id}")
+        except sqlite3.Error:
+            response = {f"Error adding {self.model_to_str()} with id: {obj.id}"}
+            logging.debug(response)
+        return response
+
+    def get_all_collections(self, force_refresh: bool = False) -> dict:
+        """Every read comes from the database so a refresh is never needed"""
+        rows = self._connect().execute(f"SELECT id, data FROM {self.table}")
+        return {obj_id: json.loads(data) for obj_id, data in rows}
+
+    def iter_collections(
+        self,
+        after_id: Optional[str] = None,
+        id_prefix: Optional[str] = None,
+        function: Optional[str] = None,
+    ) -> Iterator[Tuple[str, dict]]:
+        """Yields the resources in id order starting after an id.  Rows are
+        read in batches that each use a single query so the iterator can be
+        advanced from different threads."""
+        query = f"SELECT id, data FROM {self.table} WHERE id > ?"
+        filters = []
+        if id_prefix:
+            """Every id with the prefix sorts before the prefix followed by
+            the largest code point so the id index limits the scan"""
+            query += " AND id >= ? AND id < ?"
+            filters += [id_prefix, f"{id_prefix}\U0010ffff"]
+        if function:
+            query += " AND json_extract(data, '$.function') = ?"
+            filters.append(function)
+        query += " ORDER BY id LIMIT ?"
+        last_id = after_id or ""
+        while True:
+            rows = (
+                self._connect()
+                .execute(query, [last_id, *filters, SQLITE_ITER_BATCH_SIZE])
+                .fetchall()
+            )
+            for obj_id, data in rows:
+                yield obj_id, json.loads(data)
+            if len(rows) < SQLITE_ITER_BATCH_SIZE:
+                break
+            last_id = rows[-1][0]
+
+    def delete_collection(self, obj_id: str) -> dict:
+        response = {"data": f"Deleted {self.model_to_str()} with id: {obj_id}"}
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"DELETE FROM {self.table} WHERE id = ?", (str(obj_id),)
+            )
+        if cursor.rowcount == 0:
+            response = {
+                "data": f"{self.model_to_str()} does not exist: {obj_id}"
+            }
+        logging.debug(response)
+        return response
+
+    def import_json_collection(self, collection_dir: Path = None) -> int:
+        """Copies the files of a JsonCollectionResource directory into
+        the database in one transaction and returns the number of resources
+        copied.  Resources that are already in the database are replaced and
+        rows without a file are deleted so the import can be run again while
+        the json collection is in use.  Rows of files that can not be read
+        are kept."""
+        collection_dir = collection_dir or self.collection_dir
+        rows = []
+        file_ids = set()
+        for file_path in collection_dir.glob("*.json"):
+            file_ids.add(file_path.stem)
+            try:
+                obj = serializers.load_file(file_path)
+                rows.append((file_path.stem, json.dumps(obj)))
+            except (OSError, ValueError):
+                logging.warning(f"Skipped unreadable file: {file_path}")
+        deleted_ids = self.get_ids() - file_ids
+        with self._connect() as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (id, data) "
+                "VALUES (?, ?)",
+                rows,
+            )
+            connection.executemany(
+                f"DELETE FROM {self.table} WHERE id = ?",
+                [(obj_id,) for obj_id in deleted_ids],
+            )
+        if deleted_ids:
+            logging.debug(
+                f"Deleted {self.table}s without a file: {deleted_ids}"
+            )
+        return len(rows)
@@ -0,0 +1,131 @@
+"""
+OCR Cache
+    Remembers the words recognized in a captured region so a region that is
+    pixel identical to an earlier capture is not read again.
+        1. Results are keyed by a digest of the region content and every
+            setting that changes the recognized words
+        2. The least recently used results are evicted when the memory cap
+            is reached
+        3. With the redis backend results are also shared between the api
+            and the celery workers
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import conditional_cache, redis_cache
+from .ocr_engine import OcrWord
+
+OCR_CACHE_MAX_BYTES = int(
+    os.environ.get("OCR_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+)
+OCR_CACHE_BACKEND = os.environ.get("OCR_CACHE_BACKEND", "memory")
+OCR_CACHE_TTL = int(os.environ.get("OCR_CACHE_TTL", 300))
+
+
+def get_cache_key(region: np.ndarray, *ocr_settings) -> str:
+    """Digest of the region content and the OCR settings such as the
+    profile, mode, whitelist and glyph set"""
+    settings_digest = hashlib.blake2b(
+        json.dumps(ocr_settings).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    return f"{conditional_cache.content_digest(region)}:{settings_digest}"
+
+
+class OcrResultCache:
+    """Least recently used cache of recognized words and the scale of the
+    image they were recognized in, capped by the size of the results"""
+
+    def __init__(
+        self,
+        max_bytes: int = OCR_CACHE_MAX_BYTES,
+        backend: str = OCR_CACHE_BACKEND,
+        ttl: int = OCR_CACHE_TTL,
+    ):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, key: str, ocr_result: str) -> None:
+        with self._lock:
+            if key in self._results:
+                self.current_bytes -= len(self._results.pop(key))
+            self._results[key] = ocr_result
+            self.current_bytes += len(ocr_result)
+            while self.current_bytes > self.max_bytes and self._results:
+                _, evicted = self._results.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[Tuple[List[OcrWord], float]]:
+        with self._lock:
+            ocr_result = self._results.get(key)
+            if ocr_result is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+        if ocr_result is None and self.backend == "redis":
+            try:
+                ocr_result = redis_cache.get_ocr_result(key)
+            except Exception as ex:
+                logging.debug(ex)
+                self.redis_errors += 1
+            if ocr_result is not None:
+                self.redis_hits += 1
+                self._put(key, ocr_result)
+        if ocr_result is None:
+            self.misses += 1
+            return None
+        ocr_result = json.loads(ocr_result)
+        return (
+            [OcrWord(*word) for word in ocr_result["words"]],
+            ocr_result["scale"],
+        )
+
+    def set(self, key: str, words: List[OcrWord], scale: float) -> None:
+        ocr_result = json.dumps({"scale": scale, "words": words})
+        self._put(key, ocr_result)
+        if self.backend == "redis":
+            try:
+                redis_cache.set_ocr_result(key, ocr_result, self.ttl)
+            except Exception as ex:
+                logging.debug(ex)
+                self.redis_errors += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._results),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "redis_errors": self.redis_errors,
+            "hit_rate": (
+                (self.hits + self.redis_hits) / lookups if lookups else 0.0
+            ),
+        }
+
+
+ocr_cache = OcrResultCache()
@@ -0,0 +1,268 @@
+"""
+OCR Engine
+    Long lived optical character recognition used by capture_screen_data.
+        1. tesserocr is used when it is installed so the tesseract language
+            model stays loaded in a bounded pool of apis and images are
+            passed in memory
+        2. pytesseract is used as a fallback which starts a tesseract
+            process for each image
+        3. Images are given as grayscale or BGR arrays and the recognized
+            words are returned with their bounding boxes and confidence
+        4. Captured regions are prepared for OCR with the scale factor,
+            interpolation, threshold mode and inversion of an OCR profile
+        5. The page segmentation mode and character whitelist are set for
+            each image so single lines, words and numbers skip the full
+            page layout analysis
+"""
+import logging
+import os
+import threading
+from typing import List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+import pytesseract
+
+from .constants import OCR_PROFILES
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+OCR_LANGUAGE = os.environ.get("OCR_LANGUAGE", "eng")
+"""Number of tesseract apis that a process keeps loaded which limits how
+many captures are read in parallel with tesserocr"""
+OCR_API_POOL_SIZE = int(os.environ.get("OCR_API_POOL_SIZE", 4))
+DEFAULT_PSM = 3
+INTERPOLATIONS = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "area": cv2.INTER_AREA,
+}
+
+
+def preprocess(image: np.ndarray, ocr_profile: str = "default") -> np.ndarray:
+    """Converts a BGR region to grayscale, scales it and thresholds it with
+    the settings of an OCR profile.  The region is converted to grayscale
+    before it is scaled so only one channel is resized."""
+    profile = OCR_PROFILES.get(ocr_profile)
+    if profile is None:
+        raise ValueError(f"Invalid OCR profile: {ocr_profile}")
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = profile["scale"]
+    if scale != 1:
+        height, width = image.shape[:2]
+        image = cv2.resize(
+            image,
+            (int(width * scale), int(height * scale)),
+            interpolation=INTERPOLATIONS[profile["interpolation"]],
+        )
+    if profile["threshold"] == "otsu":
+        image = cv2.threshold(
+            image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+        )[1]
+    elif profile["threshold"] == "adaptive":
+        image = cv2.adaptiveThreshold(
+            image,
+            255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY_INV,
+            31,
+            10,
+        )
+    if profile["invert"]:
+        image = cv2.bitwise_not(image)
+    return image
+
+
+class OcrWord(NamedTuple):
+    text: str
+    x: int
+    y: int
+    width: int
+    height: int
+    confidence: float
+
+
+class OcrEngine:
+    """Recognizes words within an image with tesseract apis that are kept
+    alive in a pool which is shared by the threads of a process"""
+
+    def __init__(
+        self,
+        language: str = OCR_LANGUAGE,
+        use_tesserocr=True,
+        max_apis: int = OCR_API_POOL_SIZE,
+    ):
+        self.language = language
+        self.use_tesserocr = use_tesserocr and tesserocr is not None
+        self.max_apis = max_apis
+        self.num_images = 0
+        self.num_fallbacks = 0
+        self._reset_pool()
+
+    @property
+    def backend(self) -> str:
+        return "tesserocr" if self.use_tesserocr else "pytesseract"
+
+    def _reset_pool(self) -> None:
+        """The apis of a parent process can not be used after a fork so a
+        forked process starts with an empty pool"""
+        self.num_apis = 0
+        self._idle_apis = []
+        self._available = threading.BoundedSemaphore(self.max_apis)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _acquire_api(self):
+        """Checks out an idle api or creates one while the pool is not full
+        and waits for an api to be released otherwise.  An api is only used
+        by one thread at a time because it is not thread safe."""
+        if self._pid != os.getpid():
+            self._reset_pool()
+        self._available.acquire()
+        with self._lock:
+            api = self._idle_apis.pop() if self._idle_apis else None
+        if api is None:
+            try:
+                api = tesserocr.PyTessBaseAPI(lang=self.language)
+            except Exception:
+                self._available.release()
+                raise
+            with self._lock:
+                self.num_apis += 1
+        return api
+
+    def _release_api(self, api) -> None:
+        with self._lock:
+            self._idle_apis.append(api)
+        self._available.release()
+
+    def close(self) -> None:
+        """Unloads the idle apis of the pool"""
+        with self._lock:
+            idle_apis, self._idle_apis = self._idle_apis, []
+            self.num_apis -= len(idle_apis)
+        for api in idle_apis:
+            api.End()
+
+    def _tesserocr_words(
+        self, api, image: np.ndarray, psm: int, whitelist: Optional[str]
+    ) -> List[OcrWord]:
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        try:
+            api.SetPageSegMode(psm)
+            api.SetVariable("tessedit_char_whitelist", whitelist or "")
+            api.SetImageBytes(
+                image.tobytes(),
+                width,
+                height,
+                bytes_per_pixel,
+                width * bytes_per_pixel,
+            )
+            api.Recognize()
+            words = []
+            level = tesserocr.RIL.WORD
+            for result in tesserocr.iterate_level(api.GetIterator(), level):
+                text = (result.GetUTF8Text(level) or "").strip()
+                if not text:
+                    continue
+                word_x1, word_y1, word_x2, word_y2 = result.BoundingBox(level)
+                words.append(
+                    OcrWord(
+                        text,
+                        word_x1,
+                        word_y1,
+                        word_x2 - word_x1,
+                        word_y2 - word_y1,
+                        result.Confidence(level),
+                    )
+                )
+            return words
+        finally:
+            api.Clear()
+
+    def _pytesseract_words(
+        self, image: np.ndarray, psm: int, whitelist: Optional[str]
+    ) -> List[OcrWord]:
+        config = f"--psm {psm}"
+        if whitelist:
+            config += f" -c tessedit_char_whitelist={whitelist}"
+        image_data = pytesseract.image_to_data(
+            image,
+            lang=self.language,
+            config=config,
+            output_type=pytesseract.Output.DICT,
+        )
+        words = []
+        for index, text in enumerate(image_data["text"]):
+            text = text.strip()
+            if not text:
+                continue
+            words.append(
+                OcrWord(
+                    text,
+                    int(image_data["left"][index]),
+                    int(image_data["top"][index]),
+                    int(image_data["width"][index]),
+                    int(image_data["height"][index]),
+                    float(image_data["conf"][index]),
+                )
+            )
+        return words
+
+    def image_to_words(
+        self,
+        image: np.ndarray,
+        psm: int = DEFAULT_PSM,
+        whitelist: Optional[str] = None,
+    ) -> List[OcrWord]:
+        """Recognizes the words within a grayscale or BGR image with a
+        tesseract page segmentation mode and an optional whitelist of
+        characters"""
+        if image.ndim == 3:
+            """Tesseract expects RGB pixels"""
+            if image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGB)
+            else:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        self.num_images += 1
+        if self.use_tesserocr:
+            try:
+                api = self._acquire_api()
+            except RuntimeError as ex:
+                """tesserocr is only turned off when an api can not be
+                created for example because the language is not installed"""
+                logging.warning(
+                    f"tesserocr not started, using pytesseract: {ex}"
+                )
+                self.use_tesserocr = False
+            else:
+                try:
+                    return self._tesserocr_words(api, image, psm, whitelist)
+                except RuntimeError as ex:
+                    logging.warning(
+                        f"tesserocr failed, using pytesseract: {ex}"
+                    )
+                    self.num_fallbacks += 1
+                finally:
+                    self._release_api(api)
+        return self._pytesseract_words(image, psm, whitelist)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "language": self.language,
+            "images": self.num_images,
+            "apis": self.num_apis,
+            "max_apis": self.max_apis,
+            "fallbacks": self.num_fallbacks,
+        }
+
+
+ocr_engine = OcrEngine()
@@ -3,7 +3,7 @@ Process Controller
     This is the main logic for each different actions with a display.
     It typically uses a xvfb virtual display for pyautogui to operate
     either locally or in a docker container.  Screen data is captured
-    using cv2 and pytesseract with a screenshot.  Screen data then can
+    using cv2 and the tesseract OCR engine.  Screen data then can
     be compared with different conditions and perform a result.  This
     can also be used in conjunction with a Task Manager to perform an
     ordered or re-ordered list of actions in a task.
@@ -14,25 +14,34 @@ import datetime
 import json
 import logging
 import os
-from pathlib import Path
 import random
 import subprocess
+import threading
 import time
 import uuid
-from typing import Tuple, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Union
 
 import cv2
 import enchant
 import numpy as np
-import pytesseract
 
-from . import fast_api_endpoints as api
 from . import (
     api_resources,
     async_process_controller,
+    blob_store,
+    conditional_cache,
+    image_cache,
+    image_matching,
     models,
+    ocr_cache,
     random_mouse,
     constants,
+    glyph_recognizer,
+    ocr_engine,
+    screen_capture,
+    search_hints,
+    stage_timer,
 )
 
 """Virtual display setup has to be setup before pyautogui is imported"""
@@ -48,6 +57,16 @@ pyautogui._pyautogui_x11._display = Xlib.display.Display(os.environ["DISPLAY"])
 pyautogui.FAILSAFE = False
 
 image_dir = models.resources_dir / "images"
+"""Image that is captured instead of the screen when testing"""
+test_image_path = image_dir / "test_image.png"
+english_dicts = threading.local()
+capture_pools = {}
+CAPTURE_OCR_WORKERS = int(
+    os.environ.get("CAPTURE_OCR_WORKERS", os.cpu_count() or 1)
+)
+CAPTURE_DEBUG_RETENTION = bool(
+    int(os.environ.get("CAPTURE_DEBUG_RETENTION", 0))
+)
 screen_width, screen_height = pyautogui.size()
 logging.basicConfig(level=logging.DEBUG)
 
@@ -181,24 +200,27 @@ class ImageAction(MouseAction):
     def execute_action(self, time_delay) -> None:
         needle_file_name = self.action["images"][0]
         percent_similarity = 0.9
+        method = self.action.get("image_search_method") or "exact"
 
         if self.action.get("function") == "click_image_region":
             haystack_image = self.action.get("haystack_image")
             if haystack_image:
-                haystack_file_name = haystack_image
-                delete_haystack_file = False
+                self.x, self.y = image_search(
+                    needle_file_name=needle_file_name,
+                    haystack_file_name=haystack_image,
+                    percent_similarity=percent_similarity,
+                    delete_haystack_file=False,
+                    method=method,
+                )
             else:
-                haystack_file_name = screenshot_snip(
-                    self.x1, self.y2, self.x2, self.y2
+                self.x, self.y = image_search(
+                    needle_file_name=needle_file_name,
+                    percent_similarity=percent_similarity,
+                    haystack=screenshot_snip(
+                        self.x1, self.y1, self.x2, self.y2
+                    ),
+                    method=method,
                 )
-                delete_haystack_file = True
-
-            self.x, self.y = image_search(
-                needle_file_name=needle_file_name,
-                haystack_file_name=haystack_file_name,
-                percent_similarity=percent_similarity,
-                delete_haystack_file=delete_haystack_file,
-            )
 
             if self.x != -1 and self.y != -1:
                 self.x += self.x1
@@ -212,6 +234,7 @@ class ImageAction(MouseAction):
                 haystack_file_name=haystack_file_name,
                 percent_similarity=percent_similarity,
                 delete_haystack_file=False,
+                method=method,
             )
         super().execute_action(time_delay)
 
@@ -232,6 +255,10 @@ class CaptureDataAction(MouseAction):
                 x2=self.x2,
                 y2=self.y2,
                 action_id=action_id,
+                ocr_profile=self.action.get("ocr_profile") or "default",
+                ocr_mode=self.action.get("ocr_mode") or "default",
+                ocr_whitelist=self.action.get("ocr_whitelist"),
+                glyph_set=self.action.get("glyph_set"),
             )
 
 
@@ -265,11 +292,15 @@ def open_browser(url: str) -> dict:
 
 
 def evaluate_conditional(
-    condition: str, variable_value: str, comparison_value: Optional[str] = None
+    condition: str,
+    variable_value: str,
+    comparison_value: Optional[Union[str, np.ndarray]] = None,
+    image_search_method: str = "exact",
 ) -> Optional[bool]:
     """Comparison value is provided by user and the variable_value is from
     capture_screen_data action.  This is used to compare the two values
-    and return a boolean result."""
+    and return a boolean result.  For image conditions the comparison value
+    is the haystack file name or a haystack array."""
     if condition not in constants.CONDITIONALS:
         pass
     if condition in ("greater_than", "less_than", "equals"):
@@ -301,7 +332,19 @@ def evaluate_conditional(
         return False
     if condition == "if_image_present":
         """Check to see if image is present before doing action"""
-        x, y = image_search(variable_value, comparison_value, False)
+        if isinstance(comparison_value, np.ndarray):
+            x, y = image_search(
+                variable_value,
+                haystack=comparison_value,
+                method=image_search_method,
+            )
+        else:
+            x, y = image_search(
+                variable_value,
+                comparison_value,
+                delete_haystack_file=False,
+                method=image_search_method,
+            )
         if x == -1 or y == -1:
             return False
         return True
@@ -333,29 +376,20 @@ def get_conditionals_result(
     action: models.Action, screenshot_file: str = None
 ) -> bool:
     """Evaluates conditionals for an action"""
+    return evaluate_conditions(action, screenshot_file).get("result")
+
+
+def evaluate_conditions(
+    action: models.Action, screenshot_file: str = None
+) -> dict:
+    """Evaluates every conditional of an action and returns the result.  For
+    image conditions the result also has the matches and the timestamp of
+    the frame that every condition was evaluated against."""
     image_conditions = action.get("image_conditions")
     variable_conditions = action.get("variable_conditions")
 
     if image_conditions:
-        images = action.get("images")
-        haystack_image = action.get("haystack_image")
-
-        for condition in image_conditions:
-            if condition == "if_image_present" and len(images) > 1:
-                result = asyncio.run(
-                    async_process_controller.get_image_present_result(
-                        action, haystack_image or screenshot_file
-                    )
-                )
-            else:
-                needle_file_name = images[0]
-                haystack_file_name = haystack_image or screenshot_file
-                result = evaluate_conditional(
-                    condition, needle_file_name, haystack_file_name
-                )
-
-            if not result:
-                return False
+        return evaluate_image_conditions(action, screenshot_file)
     elif variable_conditions:
         variables = action.get("variables")
         comparison_values = action.get("comparison_values")
@@ -370,11 +404,79 @@ def get_conditionals_result(
             )
 
             if not evaluate_conditional(condition, value, compare_value):
-                return False
+                return {"result": False}
+        return {"result": True}
+    return {"result": False}
+
+
+def evaluate_image_conditions(
+    action: models.Action, screenshot_file: str = None
+) -> dict:
+    """Captures one frame, converts it to grayscale once and evaluates all
+    of the image conditions of an action against it.  The images are only
+    searched once no matter how many conditions need them."""
+    images = action.get("images")
+    image_conditions = action.get("image_conditions")
+    haystack_image = action.get("haystack_image")
+    haystack_file_name = haystack_image or screenshot_file
+    method = action.get("image_search_method") or "exact"
+
+    if haystack_file_name:
+        try:
+            frame_time = (image_dir / haystack_file_name).stat().st_mtime
+        except OSError:
+            frame_time = time.time()
     else:
-        return False
+        frame_time = time.time()
+    frame_timestamp = datetime.datetime.fromtimestamp(frame_time).isoformat()
+    """Only screenshots are deleted since the haystack image belongs to the
+    action"""
+    grayscale_haystack = get_grayscale_haystack(
+        haystack_file_name, delete_haystack_file=not haystack_image
+    )
+    if grayscale_haystack is None:
+        return {"result": False, "frame_timestamp": frame_timestamp}
 
-    return True
+    cache_key = conditional_cache.get_cache_key(action, grayscale_haystack)
+    cached_result = conditional_cache.conditional_cache.get(cache_key)
+    if cached_result is not None:
+        return {**cached_result, "frame_timestamp": frame_timestamp}
+
+    matches = []
+    if "if_image_present" in image_conditions:
+        if len(images) > 1:
+            search_result = asyncio.run(
+                async_process_controller.evaluate_image_conditional(
+                    images, grayscale_haystack, method=method
+                )
+            )
+            is_image_present = search_result.get("result")
+            matches = search_result.get("matches")
+        elif haystack_file_name:
+            match = image_matching.find_needle(
+                images[0], grayscale_haystack, method=method
+            )
+            is_image_present = match.found
+            matches = [match._asdict()]
+        else:
+            match = image_search_frame(
+                images[0], grayscale_haystack, method=method
+            )
+            is_image_present = match.found
+            matches = [match._asdict()]
+
+    result = True
+    for condition in image_conditions:
+        if condition == "if_image_present":
+            result = is_image_present
+        else:
+            result = evaluate_conditional(condition, images[0])
+        if not result:
+            break
+
+    conditional_result = {"result": bool(result), "matches": matches}
+    conditional_cache.conditional_cache.set(cache_key, conditional_result)
+    return {**conditional_result, "frame_timestamp": frame_timestamp}
 
 
 def action_controller(
@@ -499,171 +601,423 @@ def mouse_pos() -> Tuple[int, int]:
     return pyautogui.position()
 
 
+def get_grayscale_haystack(
+    haystack_file_name: str = "",
+    delete_haystack_file: bool = True,
+    haystack: Optional[np.ndarray] = None,
+) -> Optional[np.ndarray]:
+    """The haystack is either a BGR array, an image file or the current display"""
+    if haystack is not None:
+        return image_matching.to_grayscale(haystack)
+    if haystack_file_name in ["", None]:
+        return screen_capture.grab_frame(grayscale=True)
+    grayscale_haystack = image_matching.load_grayscale_haystack(
+        haystack_file_name
+    )
+    """Delete haystack image since it is a representation of current screen"""
+    if delete_haystack_file:
+        (image_dir / haystack_file_name).unlink(missing_ok=True)
+    return grayscale_haystack
+
+
 def image_search(
     needle_file_name: str,
     haystack_file_name: str = "",
     percent_similarity: float = 0.9,
     delete_haystack_file: bool = True,
+    haystack: Optional[np.ndarray] = None,
+    method: str = "exact",
 ) -> Tuple[int, int]:
     """Search for 'needle' image in a 'haystack' image and return (x, y) coords"""
-    needle_file_path = str(image_dir / needle_file_name)
-    needle = cv2.imread(needle_file_path, cv2.IMREAD_UNCHANGED)
-    grayscale_needle = cv2.cvtColor(needle, cv2.COLOR_BGR2GRAY)
-    if haystack_file_name in ["", None]:
-        image_id = uuid.uuid4()
-        haystack_file_path = str(image_dir / f"{image_id}.png")
-        pyautogui.screenshot(haystack_file_path)
-    else:
-        haystack_file_path = str(image_dir / haystack_file_name)
-    haystack = cv2.imread(haystack_file_path, cv2.IMREAD_UNCHANGED)
-    grayscale_haystack = cv2.cvtColor(haystack, cv2.COLOR_BGR2GRAY)
-    result = cv2.matchTemplate(
-        grayscale_haystack, grayscale_needle, cv2.TM_CCOEFF_NORMED
+    is_display_haystack = haystack is None and haystack_file_name in [
+        "",
+        None,
+    ]
+    if is_display_haystack:
+        match = image_search_hint(needle_file_name, percent_similarity, method)
+        if match.found:
+            return match.x, match.y
+
+    grayscale_haystack = get_grayscale_haystack(
+        haystack_file_name, delete_haystack_file, haystack
     )
-    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-    """Max location has the best match with max_val to be % accuracy"""
-    width = needle.shape[1]
-    height = needle.shape[0]
-    # bottom_right = (max_loc[0] + width, max_loc[1] + height)
-    """Threshold is the % accuracy compared to original needle"""
-    threshold = percent_similarity
-    yloc, xloc = np.where(result >= threshold)
-    """Keep track of all matches and identify unique cases"""
-    matches = []
-    """Delete haystack image since it is a representation of current screen"""
-    if delete_haystack_file:
-        Path(haystack_file_path).unlink(missing_ok=True)
-    if len(xloc) > 0:
-        # logging.debug("There are {0} total matches in the haystack.".format(len(xloc)))
-        for (x, y) in zip(xloc, yloc):
-            """Twice to ensure singles are kept after picking unique cases"""
-            matches.append([int(x), int(y), int(width), int(height)])
-            matches.append([int(x), int(y), int(width), int(height)])
-        """Grouping function"""
-        matches, weights = cv2.groupRectangles(matches, 1, 0.2)
-        # logging.debug("There are {0} unique matches in the haystack.".format(len(matches)))
-        """Assuming the first match was a good match"""
-        if len(matches) > 0:
-            center_x = matches[0][0] + width / 2
-            center_y = matches[0][1] + height / 2
-            return center_x, center_y
-    else:
-        logging.debug("There are no matches.")
+    if grayscale_haystack is None:
         return -1, -1
+    match = image_matching.find_needle(
+        needle_file_name, grayscale_haystack, percent_similarity, method
+    )
+    if is_display_haystack and match.found:
+        needle = image_cache.needle_cache.get(image_dir / needle_file_name)
+        search_hints.hint_cache.update(
+            needle_file_name, match.x, match.y, needle
+        )
+    return match.x, match.y
+
+
+def image_search_hint(
+    needle_file_name: str,
+    percent_similarity: float = 0.9,
+    method: str = "exact",
+    grayscale_haystack: Optional[np.ndarray] = None,
+) -> image_matching.NeedleMatch:
+    """Search for 'needle' image only within a padded window around the
+    location it was last found at.  The window is cropped from the grayscale
+    haystack when one is given, otherwise it is grabbed from the display."""
+    not_found = image_matching.NeedleMatch(needle_file_name, -1, -1, 0.0)
+    needle = image_cache.needle_cache.get(image_dir / needle_file_name)
+    if needle is None:
+        return not_found
+    window = search_hints.hint_cache.get_window(needle_file_name, needle)
+    if window is None:
+        return not_found
+    if grayscale_haystack is None:
+        x1, y1, _, _ = screen_capture.clamp_region(window)
+        grayscale_window = screen_capture.grab_frame(
+            region=window, grayscale=True
+        )
+    else:
+        x1, y1, x2, y2 = window
+        grayscale_window = grayscale_haystack[y1:y2, x1:x2]
+    match = image_matching.find_needle(
+        needle_file_name, grayscale_window, percent_similarity, method
+    )
+    if not match.found:
+        search_hints.hint_cache.record_miss()
+        return not_found
+    search_hints.hint_cache.record_hit()
+    match = match._replace(x=match.x + x1, y=match.y + y1)
+    search_hints.hint_cache.update(needle_file_name, match.x, match.y, needle)
+    return match
+
+
+def image_search_frame(
+    needle_file_name: str,
+    grayscale_haystack: np.ndarray,
+    percent_similarity: float = 0.9,
+    method: str = "exact",
+) -> image_matching.NeedleMatch:
+    """Search for 'needle' image in a captured frame of the display by trying
+    the hint window first and updating the hint on a full frame match"""
+    match = image_search_hint(
+        needle_file_name, percent_similarity, method, grayscale_haystack
+    )
+    if match.found:
+        return match
+    match = image_matching.find_needle(
+        needle_file_name, grayscale_haystack, percent_similarity, method
+    )
+    if match.found:
+        needle = image_cache.needle_cache.get(image_dir / needle_file_name)
+        search_hints.hint_cache.update(
+            needle_file_name, match.x, match.y, needle
+        )
+    return match
+
+
+def image_search_all(
+    needle_file_name: str,
+    haystack_file_name: str = "",
+    percent_similarity: float = 0.9,
+    delete_haystack_file: bool = True,
+    haystack: Optional[np.ndarray] = None,
+) -> List[dict]:
+    """Search for every distinct 'needle' image match in a 'haystack' image
+    and return the (x, y) coords and score of each match"""
+    grayscale_haystack = get_grayscale_haystack(
+        haystack_file_name, delete_haystack_file, haystack
+    )
+    if grayscale_haystack is None:
+        return []
+    return [
+        match._asdict()
+        for match in image_matching.image_search_all(
+            needle_file_name, grayscale_haystack, percent_similarity
+        )
+    ]
+
+
+def image_search_many(
+    needle_file_names: List[str],
+    haystack_file_name: str = "",
+    percent_similarity: float = 0.9,
+    mode: str = "any",
+    delete_haystack_file: bool = False,
+    haystack: Optional[np.ndarray] = None,
+    method: str = "exact",
+) -> dict:
+    """Search for several 'needle' images in one 'haystack' image and return
+    the result with the (x, y) coords and score of each needle searched"""
+    grayscale_haystack = get_grayscale_haystack(
+        haystack_file_name, delete_haystack_file, haystack
+    )
+    if grayscale_haystack is None:
+        return {"result": False, "matches": []}
+    return image_matching.image_search_many(
+        needle_file_names, grayscale_haystack, percent_similarity, mode, method
+    )
+
+
+def get_english_dict() -> enchant.Dict:
+    """The dictionary is loaded once for each thread instead of on every
+    capture"""
+    english_dict = getattr(english_dicts, "en_US", None)
+    if english_dict is None:
+        english_dict = enchant.Dict("en_US")
+        english_dicts.en_US = english_dict
+    return english_dict
+
+
+def get_capture_pool() -> ThreadPoolExecutor:
+    """Threads do not survive a fork so every process creates its own pool.
+    The OCR engine keeps a tesseract api alive for each of its threads."""
+    pid = os.getpid()
+    pool = capture_pools.get(pid)
+    if pool is None:
+        pool = capture_pools.setdefault(
+            pid,
+            ThreadPoolExecutor(
+                max_workers=CAPTURE_OCR_WORKERS,
+                thread_name_prefix="capture_ocr",
+            ),
+        )
+    return pool
+
+
+def read_region_words(
+    img: np.ndarray,
+    ocr_profile: str,
+    ocr_mode: str,
+    ocr_whitelist: Optional[str],
+    glyph_set: Optional[str],
+    timer: stage_timer.StageTimer,
+    screenshot_id: str,
+) -> Tuple[List[ocr_engine.OcrWord], float, bool]:
+    """Recognizes the words of a captured region and returns them with the
+    scale of the image they were recognized in and whether they have to be
+    english words"""
+    """The dictionary filter is skipped for modes like numeric and for
+    custom whitelists where the words are not expected to be english"""
+    if ocr_mode not in constants.OCR_MODES:
+        logging.warning(f"Invalid ocr_mode: {ocr_mode}, using default")
+        ocr_mode = "default"
+    if ocr_profile not in constants.OCR_PROFILES:
+        logging.warning(f"Invalid ocr_profile: {ocr_profile}, using default")
+        ocr_profile = "default"
+    ocr_mode_settings = constants.OCR_MODES[ocr_mode]
+    whitelist = ocr_whitelist or ocr_mode_settings["whitelist"]
+    use_dictionary = ocr_mode_settings["dictionary"] and not ocr_whitelist
+    """A region that is pixel identical to an earlier capture with the same
+    settings reuses the words that were recognized in it.  The version of
+    the glyph set is part of the key so results are not reused after the
+    glyph set is learned again."""
+    with timer.stage("ocr_cache"):
+        glyph_set_version = (
+            glyph_recognizer.glyph_recognizer.get_glyph_set_version(glyph_set)
+            if ocr_mode == "glyph" and glyph_set
+            else None
+        )
+        ocr_cache_key = ocr_cache.get_cache_key(
+            img, ocr_profile, ocr_mode, whitelist, glyph_set, glyph_set_version
+        )
+        cached_ocr_result = ocr_cache.ocr_cache.get(ocr_cache_key)
+    if cached_ocr_result is not None:
+        words, scale = cached_ocr_result
+        return words, scale, use_dictionary
+    words = None
+    scale = 1
+    if ocr_mode == "glyph":
+        """Glyph templates read the region as captured and OCR is only used
+        when a glyph is not recognized with enough confidence"""
+        with timer.stage("glyph"):
+            words = glyph_recognizer.glyph_recognizer.recognize(img, glyph_set)
+    if words is None:
+        """Prepare screenshot for OCR with the preprocessing of the OCR
+        profile"""
+        with timer.stage("preprocess"):
+            thr = ocr_engine.preprocess(img, ocr_profile)
+        scale = constants.OCR_PROFILES[ocr_profile]["scale"]
+        with timer.stage("ocr"):
+            words = ocr_engine.ocr_engine.image_to_words(
+                thr, ocr_mode_settings["psm"], whitelist
+            )
+        if CAPTURE_DEBUG_RETENTION:
+            with timer.stage("debug_retention"):
+                screenshot_dir = models.resources_dir / "screenshot"
+                thr_path = screenshot_dir / f"{screenshot_id}_thr.png"
+                cv2.imwrite(str(thr_path), thr)
+    ocr_cache.ocr_cache.set(ocr_cache_key, words, scale)
+    return words, scale, use_dictionary
+
+
+def get_screen_objects(
+    words: List[ocr_engine.OcrWord],
+    scale: float,
+    use_dictionary: bool,
+    x1: int,
+    y1: int,
+    action_id: Optional[str],
+    timestamp: str,
+    screen_data_id: str,
+) -> List[models.ScreenObject]:
+    """This loops through all words and numbers found within the region
+    and collects them as screen objects.  Screen objects of an existing
+    action are buttons of that action and the ids of screen objects are
+    made of the screen data id so they are found without an index."""
+    screen_objects = []
+    english_dict = get_english_dict()
+    for word in words:
+        if (
+            use_dictionary
+            and not word.text.isnumeric()
+            and not english_dict.check(word.text)
+        ):
+            continue
+        """Word boxes are scaled back to the captured region"""
+        word_x1, word_y1, word_width, word_height = (
+            int(round(word.x / scale)),
+            int(round(word.y / scale)),
+            int(round(word.width / scale)),
+            int(round(word.height / scale)),
+        )
+        """Screen objects are data that store information from 
+            GUI elements and/or actions"""
+        screen_objects.append(
+            models.ScreenObject(
+                id=models.ScreenDataResource.screen_object_id(
+                    screen_data_id, len(screen_objects)
+                ),
+                type="button" if action_id else "text",
+                action_id=action_id,
+                timestamp=timestamp,
+                text=word.text,
+                x1=x1 + word_x1,
+                y1=y1 + word_y1,
+                x2=x1 + word_x1 + word_width,
+                y2=y1 + word_y1 + word_height,
+            )
+        )
+    return screen_objects
+
+
+def get_screen_variables(
+    screen_objects: List[models.ScreenObject],
+) -> List[str]:
+    """The variables of a capture are the screen object ids and their text"""
+    return [
+        ", ".join(screen_object.id for screen_object in screen_objects),
+        ", ".join(screen_object.text for screen_object in screen_objects),
+    ]
+
+
+def get_capture_action(
+    action_id: Optional[str],
+    is_existing_action: bool,
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    variables: List[str],
+) -> models.Action:
+    """Returns the existing action with the captured variables or a new
+    capture_screen_data action for the region"""
+    if not is_existing_action:
+        new_action = {
+            "function": "capture_screen_data",
+            "variables": variables,
+            "x1": x1,
+            "x2": x2,
+            "y1": y1,
+            "y2": y2,
+        }
+        return models.Action(**new_action)
+    updated_action = api_resources.storage.get_action(action_id)
+    logging.debug(updated_action)
+    updated_action["variables"] = variables
+    return models.Action(**updated_action)
 
 
 def capture_screen_data(
-    x1: int, y1: int, x2: int, y2: int, action_id: str, testing: bool = False
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    action_id: str,
+    testing: bool = False,
+    ocr_profile: str = "default",
+    ocr_mode: str = "default",
+    ocr_whitelist: Optional[str] = None,
+    glyph_set: Optional[str] = None,
 ) -> dict:
     """This function captures data within the region within (x1, y1) and (x2, y2).
     The data is then processed, stored and returned as a string."""
     response = {"data": "Screen data not captured"}
     screenshot_id = str(uuid.uuid4())
-    screenshot_path = str(
-        models.resources_dir / "screenshot" / f"{screenshot_id}.png"
+    screenshot_dir = models.resources_dir / "screenshot"
+    timer = stage_timer.StageTimer("capture_screen_data")
+    """Every stage works on in-memory arrays and images are only written
+    to the screenshot directory when debug retention is enabled"""
+    with timer.stage("capture"):
+        if testing:
+            img = cv2.imread(str(test_image_path))[y1:y2, x1:x2, :]
+        else:
+            img = screen_capture.grab_frame(region=(x1, y1, x2, y2))
+    words, scale, use_dictionary = read_region_words(
+        img,
+        ocr_profile,
+        ocr_mode,
+        ocr_whitelist,
+        glyph_set,
+        timer,
+        screenshot_id,
     )
-    pyautogui.screenshot(screenshot_path)
-    if testing:
-        test_image = str(models.resources_dir / "images" / "test_image.png")
-        img = cv2.imread(test_image)
-    else:
-        img = cv2.imread(screenshot_path)
-    width = x2 - x1
-    height = y2 - y1
-    if width != screen_width and height != screen_height:
-        cv2.imwrite(screenshot_path, img[y1:y2, x1:x2, :])
-        img = cv2.imread(screenshot_path)
-    """Prepare screenshot for Pytesseract OCR"""
-    png_img = cv2.imencode(".png", img)
-    b64_string = base64.b64encode(png_img[1]).decode("utf-8")
-    (h, w) = img.shape[:2]
-    img = cv2.resize(img, (w * 5, h * 5))
-    gry = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    thr = cv2.threshold(gry, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-    cv2.imwrite(screenshot_path, thr)
-    """There might be some case where inverting the image gives better results"""
-    # screenshot_path = resources_dir / f"invert_{screenshot_id}.png"
-    # inverted_thr = cv2.bitwise_not(thr)
-    # cv2.imwrite(screenshot_path, inverted_thr)
-    # inverted_img_data = pytesseract.image_to_data(thr)
-    img_data = pytesseract.image_to_data(thr)
+    if CAPTURE_DEBUG_RETENTION:
+        with timer.stage("debug_retention"):
+            screenshot_path = screenshot_dir / f"{screenshot_id}.png"
+            cv2.imwrite(str(screenshot_path), img)
     timestamp = datetime.datetime.now().isoformat()
-    Path(screenshot_path).unlink(missing_ok=True)
-
-    count = 0
-    screen_obj_ids = []
-    screen_obj_values = []
-    english_dict = enchant.Dict("en_US")
-    for index, word_data in enumerate(img_data.splitlines()):
-        """This loops through all words and numbers found within the region
-        and stores in screen_object json files."""
-        if index == 0:
-            continue
-        word = word_data.split()
-        if len(word) == 12:
-            if word[11].isnumeric() or english_dict.check(word[11]):
-                word_id = str(uuid.uuid4())
-                text = word[11]
-                screen_obj_ids.append(word_id)
-                screen_obj_values.append(text)
-                word_x1, word_y1, word_width, word_height = (
-                    int(word[6]),
-                    int(word[7]),
-                    int(word[8]),
-                    int(word[9]),
-                )
-                if (
-                    action_id
-                    in api_resources.storage.action_collection.get_all_collections()
-                ):
-                    word_action_id = action_id
-                else:
-                    word_action_id = None
-                data_type = (
-                    "button"
-                    if action_id
-                    in api_resources.storage.action_collection.get_all_collections()
-                    else "text"
-                )
-                """Screen objects are data that store information from 
-                    GUI elements and/or actions"""
-                screen_object_json = {
-                    "id": f"{word_id}",
-                    "type": data_type,
-                    "action_id": word_action_id,
-                    "timestamp": timestamp,
-                    "text": text,
-                    "x1": x1 + word_x1,
-                    "y1": y1 + word_y1,
-                    "x2": x1 + word_x1 + word_width,
-                    "y2": y1 + word_y1 + word_height,
-                }
-                response = models.JsonResource(
-                    screen_object_json
-                ).store_resource()
-                logging.debug(response)
-                if response.get("data").startswith("Saved"):
-                    count = count + 1
-                else:
-                    logging.debug(response)
-    """Screen Data JSON files are mainly kept for debugging purposes"""
-    screen_data_json = {
-        "id": screenshot_id,
-        "timestamp": timestamp,
-        "base64str": b64_string,
-        "screen_obj_ids": screen_obj_ids,
-    }
+
+    with timer.stage("action_lookup"):
+        is_existing_action = api_resources.storage.has_action(action_id)
+    screen_objects = get_screen_objects(
+        words,
+        scale,
+        use_dictionary,
+        x1,
+        y1,
+        action_id if is_existing_action else None,
+        timestamp,
+        screenshot_id,
+    )
+    screen_obj_ids = [screen_object.id for screen_object in screen_objects]
+    variables = get_screen_variables(screen_objects)
+    count = len(screen_objects)
+    blob_id = None
     if count > 0:
-        response = models.JsonResource(screen_data_json).store_resource()
+        """The screenshot is only stored for captures that found screen
+        objects so no blob is left without screen data"""
+        with timer.stage("encode"):
+            png_img = cv2.imencode(".png", img)
+        with timer.stage("blob"):
+            blob_id = blob_store.blob_store.put(png_img[1].tobytes())
+        """Screen Data JSON files are mainly kept for debugging purposes.
+        The screen objects are stored with their screen data in a single
+        file."""
+        screen_data = models.ScreenData(
+            id=screenshot_id,
+            timestamp=timestamp,
+            blob_id=blob_id,
+            screen_obj_ids=screen_obj_ids,
+        )
+        with timer.stage("store"):
+            response = api_resources.storage.store_screen_data(
+                screen_data, screen_objects
+            )
         logging.debug(response)
+    timings = timer.finish()
     if count == 0:
         response = {"data": "No screen objects found"}
         logging.warning(response)
     elif testing:
-        variables = [
-            ", ".join(screen_obj_ids),
-            ", ".join(screen_obj_values),
-        ]
         test_result_dict = {
             "function": "capture_screen_data",
             "variables": variables,
@@ -673,61 +1027,237 @@ def capture_screen_data(
             "y2": y2,
             "screen_data_id": screenshot_id,
             "timestamp": timestamp,
-            "base64str": b64_string,
+            "blob_id": blob_id,
             "screen_obj_ids": screen_obj_ids,
+            "timings": timings,
         }
         return test_result_dict
-    elif (
-        action_id
-        not in api_resources.storage.action_collection.get_all_collections()
-    ):
-        """Create new action"""
-        variables = [
-            ", ".join(screen_obj_ids),
-            ", ".join(screen_obj_values),
-        ]
-        new_action = {
-            "function": "capture_screen_data",
-            "variables": variables,
-            "x1": x1,
-            "x2": x2,
-            "y1": y1,
-            "y2": y2,
-        }
-        new_action_obj = models.Action(**new_action)
-        response = api_resources.storage.add_action(action=new_action_obj)
     else:
-        """Update action with captured screen info"""
-        updated_action = api.get_action(action_id=action_id)
-        variables = [
-            ", ".join(screen_obj_ids),
-            ", ".join(screen_obj_values),
-        ]
-        logging.debug(updated_action)
-        updated_action["variables"] = variables
-        updated_action_obj = models.Action(**updated_action)
-        response = api_resources.storage.add_action(
-            action_id=action_id, action=updated_action_obj
+        action = get_capture_action(
+            action_id, is_existing_action, x1, y1, x2, y2, variables
         )
+        if is_existing_action:
+            """Update action with captured screen info"""
+            response = api_resources.storage.update_action(
+                action_id=action_id, action=action
+            )
+        else:
+            """Create new action"""
+            response = api_resources.storage.add_action(action=action)
     return response
 
 
+def resolve_capture_region(region: models.CaptureRegion) -> dict:
+    """Fills the coordinates and OCR settings of a batch capture region that
+    are not given with the settings of its action"""
+    is_existing_action = api_resources.storage.has_action(region.action_id)
+    action = (
+        api_resources.storage.get_action(region.action_id)
+        if is_existing_action
+        else {}
+    )
+    resolved_region = {
+        "action_id": region.action_id,
+        "is_existing_action": is_existing_action,
+    }
+    for field in ("x1", "y1", "x2", "y2", "ocr_whitelist", "glyph_set"):
+        value = getattr(region, field)
+        if value is None:
+            value = action.get(field)
+        resolved_region[field] = value
+    for field in ("ocr_profile", "ocr_mode"):
+        resolved_region[field] = (
+            getattr(region, field) or action.get(field) or "default"
+        )
+    if None in (
+        resolved_region["x1"],
+        resolved_region["y1"],
+        resolved_region["x2"],
+        resolved_region["y2"],
+    ):
+        raise ValueError(f"Region has no coordinates: {region.action_id}")
+    return resolved_region
+
+
+def capture_region(img: np.ndarray, region: dict, screenshot_id: str) -> tuple:
+    """Reads the words of one region of a batch capture and encodes the
+    region when words were found.  This runs on a thread of the capture
+    pool."""
+    timer = stage_timer.StageTimer("capture_region")
+    words, scale, use_dictionary = read_region_words(
+        img,
+        region["ocr_profile"],
+        region["ocr_mode"],
+        region["ocr_whitelist"],
+        region["glyph_set"],
+        timer,
+        screenshot_id,
+    )
+    png_bytes = None
+    if words:
+        with timer.stage("encode"):
+            png_bytes = cv2.imencode(".png", img)[1].tobytes()
+    if CAPTURE_DEBUG_RETENTION:
+        with timer.stage("debug_retention"):
+            screenshot_dir = models.resources_dir / "screenshot"
+            screenshot_path = screenshot_dir / f"{screenshot_id}.png"
+            cv2.imwrite(str(screenshot_path), img)
+    timer.finish()
+    return png_bytes, words, scale, use_dictionary
+
+
+def capture_screen_data_batch(
+    regions: List[models.CaptureRegion], testing: bool = False
+) -> dict:
+    """Captures several regions from one screenshot and reads their words
+    in parallel on the capture pool.  The screen data of all regions and the
+    variables of their actions are stored in one pass once every region has
+    been read."""
+    timer = stage_timer.StageTimer("capture_screen_data_batch")
+    with timer.stage("action_lookup"):
+        try:
+            regions = [resolve_capture_region(region) for region in regions]
+        except ValueError as ex:
+            return {"data": str(ex)}
+    if not regions:
+        return {"data": []}
+    """Only the rectangle that contains every region is captured"""
+    frame_x1 = min(region["x1"] for region in regions)
+    frame_y1 = min(region["y1"] for region in regions)
+    frame_x2 = max(region["x2"] for region in regions)
+    frame_y2 = max(region["y2"] for region in regions)
+    with timer.stage("capture"):
+        if testing:
+            frame = cv2.imread(str(test_image_path))[
+                frame_y1:frame_y2, frame_x1:frame_x2, :
+            ]
+        else:
+            frame = screen_capture.grab_frame(
+                region=(frame_x1, frame_y1, frame_x2, frame_y2)
+            )
+    screenshot_ids = [str(uuid.uuid4()) for _ in regions]
+    with timer.stage("ocr"):
+        pool = get_capture_pool()
+        futures = [
+            pool.submit(
+                capture_region,
+                frame[
+                    region["y1"] - frame_y1 : region["y2"] - frame_y1,
+                    region["x1"] - frame_x1 : region["x2"] - frame_x1,
+                ],
+                region,
+                screenshot_id,
+            )
+            for region, screenshot_id in zip(regions, screenshot_ids)
+        ]
+        region_results = [future.result() for future in futures]
+    timestamp = datetime.datetime.now().isoformat()
+
+    captures = []
+    responses = []
+    pending_actions = []
+    for region, screenshot_id, region_result in zip(
+        regions, screenshot_ids, region_results
+    ):
+        png_bytes, words, scale, use_dictionary = region_result
+        is_existing_action = region["is_existing_action"]
+        screen_objects = get_screen_objects(
+            words,
+            scale,
+            use_dictionary,
+            region["x1"],
+            region["y1"],
+            region["action_id"] if is_existing_action else None,
+            timestamp,
+            screenshot_id,
+        )
+        if not screen_objects:
+            responses.append({"data": "No screen objects found"})
+            continue
+        """The region is only stored for captures that found screen
+        objects so no blob is left without screen data"""
+        blob_id = blob_store.blob_store.put(png_bytes)
+        screen_data = models.ScreenData(
+            id=screenshot_id,
+            timestamp=timestamp,
+            blob_id=blob_id,
+            screen_obj_ids=[
+                screen_object.id for screen_object in screen_objects
+            ],
+        )
+        captures.append((screen_data, screen_objects))
+        variables = get_screen_variables(screen_objects)
+        if testing:
+            responses.append(
+                {
+                    "function": "capture_screen_data",
+                    "variables": variables,
+                    "x1": region["x1"],
+                    "x2": region["x2"],
+                    "y1": region["y1"],
+                    "y2": region["y2"],
+                    "screen_data_id": screenshot_id,
+                    "timestamp": timestamp,
+                    "blob_id": blob_id,
+                    "screen_obj_ids": screen_data.screen_obj_ids,
+                }
+            )
+            continue
+        action = get_capture_action(
+            region["action_id"],
+            is_existing_action,
+            region["x1"],
+            region["y1"],
+            region["x2"],
+            region["y2"],
+            variables,
+        )
+        pending_actions.append((len(responses), is_existing_action, action))
+        responses.append(None)
+    with timer.stage("store"):
+        if captures:
+            logging.debug(
+                api_resources.storage.store_screen_data_batch(captures)
+            )
+        updated_actions = iter(
+            api_resources.storage.update_actions(
+                [
+                    action
+                    for _, is_existing_action, action in pending_actions
+                    if is_existing_action
+                ]
+            )
+        )
+        for index, is_existing_action, action in pending_actions:
+            if is_existing_action:
+                responses[index] = next(updated_actions)
+            else:
+                responses[index] = api_resources.storage.add_action(action)
+    return {"data": responses, "timings": timer.finish()}
+
+
 def screen_snip(
-    x1: int, y1: int, x2: int, y2: int, image: models.Image
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    image: models.Image,
+    include_base64: bool = False,
 ) -> dict:
     """This function is used to capture a section of the screen and
-    store in resources/images as png and json files"""
-    base64str = image.base64str
-    decoded64str = base64.b64decode(base64str)
-    image_id = uuid.uuid4()
-    image_path = str(image_dir / f"{image_id}.png")
-    with open(image_path, "wb") as f:
-        f.write(decoded64str)
-    img = cv2.imread(image_path)
-    cv2.imwrite(image_path, img[y1:y2, x1:x2, :])
-    snip_img = cv2.imread(image_path)
+    store it in resources/images as a png needle file.  The png bytes of the
+    snip are stored in the blob store and the base 64 string is only added
+    to the response when it is asked for."""
+    image_bytes = blob_store.read_image_bytes(image.dict())
+    if image_bytes is None:
+        return {"data": f"Image has no data: {image.id}"}
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    snip_img = img[y1:y2, x1:x2, :]
     snip_png_img = cv2.imencode(".png", snip_img)
-    b64_string = base64.b64encode(snip_png_img[1]).decode("utf-8")
+    image_id = uuid.uuid4()
+    image_path = image_dir / f"{image_id}.png"
+    image_path.write_bytes(snip_png_img[1].tobytes())
+    blob_id = blob_store.blob_store.put(snip_png_img[1].tobytes())
     height = snip_img.shape[0]
     width = snip_img.shape[1]
     """Build json object"""
@@ -739,39 +1269,33 @@ def screen_snip(
         "y2": y2,
         "width": width,
         "height": height,
-        "base64str": f"{b64_string}",
+        "blob_id": blob_id,
     }
     image_obj = models.Image(**image_json)
     response = models.JsonResource(image_json).store_resource()
     if response.get("data").startswith("Saved"):
         response = image_obj
+        if include_base64:
+            response.base64str = blob_store.blob_store.get_base64(blob_id)
     logging.debug(response)
     return response
 
 
-def screenshot_snip(x1: int, y1: int, x2: int, y2: int) -> Path:
-    img, image_path = screen_shot_image()
-    cv2.imwrite(str(image_path), img[y1:y2, x1:x2, :])
-    return image_path
+def screenshot_snip(x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+    """This function returns a section of the current display as an image"""
+    return screen_capture.grab_frame(region=(x1, y1, x2, y2))
 
 
-def screen_shot_image() -> (Any, Path):
+def screen_shot_image() -> np.ndarray:
     """This function uses the current display and returns an image"""
-    timestamp = round(time.time() * 1000)
-    screenshot_path = (
-        models.resources_dir / "screenshot" / f"screenshot_{timestamp}.png"
-    )
-    pyautogui.screenshot(screenshot_path)
-    img = cv2.imread(str(screenshot_path))
-    return img, screenshot_path
+    return screen_capture.grab_frame()
 
 
 def screen_shot_response() -> dict:
     """This function uses the current display and returns a base-64 image"""
-    img, screenshot_path = screen_shot_image()
+    img = screen_shot_image()
     png_img = cv2.imencode(".png", img)
     b64_string = base64.b64encode(png_img[1]).decode("utf-8")
-    screenshot_path.unlink()
     response = {"data": b64_string}
     return response
 
@@ -780,5 +1304,5 @@ def save_screenshot() -> str:
     """This is used by the task manager to pass screenshots to the celery workers"""
     file_name = f"{uuid.uuid4()}.png"
     file_path = image_dir / file_name
-    pyautogui.screenshot(file_path)
+    cv2.imwrite(str(file_path), screen_capture.grab_frame())
     return file_name
@@ -3,15 +3,22 @@ Redis is only used for storing and retrieving the result of
 celery workers and caching the action collection since it is used
 frequently.  This is mainly used by the Task Manager to offload
 more expensive image processing to celery workers and allow some
-endpoints to be async.
+endpoints to be async.  OCR results can also be shared between
+workers through redis.  Cached resources can be encoded with the same
+serializers as the stored resources.
 """
+import os
 from typing import Optional
 
 import redis
 from redis.commands.json.path import Path
 
+from . import serializers
 
 rc = redis.Redis(host="redis", port=6379, db=0)
+"""Cached resources are stored as RedisJSON documents or as the bytes of
+one of the serializer formats"""
+REDIS_CACHE_FORMAT = os.environ.get("REDIS_CACHE_FORMAT", "redisjson")
 
 
 def set_condition_result(key: str, result: bool) -> None:
@@ -25,13 +32,23 @@ def get_condition_result(key: str) -> Optional[bool]:
 
 def set_json(json_type: str, obj_id: str, json_dict: dict) -> None:
     json_cache = {json_type: json_dict}
-    rc.json().set(f"{json_type}:{obj_id}", Path.root_path(), json_cache)
+    if REDIS_CACHE_FORMAT == "redisjson":
+        rc.json().set(f"{json_type}:{obj_id}", Path.root_path(), json_cache)
+    else:
+        rc.set(
+            f"{json_type}:{obj_id}",
+            serializers.dumps(json_cache, REDIS_CACHE_FORMAT),
+        )
 
 
 def get_json(json_type: str, obj_id: str) -> dict:
     cached_value = None
     try:
-        cache_dict = rc.json().get(f"{json_type}:{obj_id}")
+        if REDIS_CACHE_FORMAT == "redisjson":
+            cache_dict = rc.json().get(f"{json_type}:{obj_id}")
+        else:
+            cache_bytes = rc.get(f"{json_type}:{obj_id}")
+            cache_dict = serializers.loads(cache_bytes) if cache_bytes else {}
         cached_value = cache_dict.get(json_type)
     except Exception as e:
         print(e)
@@ -41,6 +58,15 @@ def get_json(json_type: str, obj_id: str) -> dict:
 
 def del_json(json_type: str, obj_id: str) -> None:
     try:
-        rc.json().delete(f"{json_type}:{obj_id}", Path.root_path())
+        rc.delete(f"{json_type}:{obj_id}")
     except Exception as e:
         print(e)
+
+
+def set_ocr_result(key: str, ocr_result: str, ttl: int) -> None:
+    rc.set(f"ocr:{key}", ocr_result, ex=ttl)
+
+
+def get_ocr_result(key: str) -> Optional[str]:
+    cached_value = rc.get(f"ocr:{key}")
+    return cached_value.decode("utf-8") if cached_value else None
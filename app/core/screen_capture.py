@@ -0,0 +1,80 @@
+"""
+Screen Capture
+    Grabs frames straight from the X server as NumPy arrays.  This avoids
+    having pyautogui encode a PNG screenshot to disk that is then read back
+    with cv2.  A region can be requested so only that rectangle is copied
+    from the X server.  The xvfb virtual display has to be started before
+    the first frame is grabbed since the display is read from the DISPLAY
+    variable.
+"""
+import os
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+import Xlib.display
+from Xlib import X
+
+_local = threading.local()
+
+
+def get_display() -> Xlib.display.Display:
+    """Each thread keeps its own connection since Xlib displays are not
+    thread safe"""
+    display = getattr(_local, "display", None)
+    if display is None:
+        display = Xlib.display.Display(os.environ["DISPLAY"])
+        _local.display = display
+    return display
+
+
+def clamp_region(
+    region: Optional[Tuple[int, int, int, int]]
+) -> Tuple[int, int, int, int]:
+    """Limits an (x1, y1, x2, y2) region to the bounds of the display"""
+    screen = get_display().screen()
+    screen_width = screen.width_in_pixels
+    screen_height = screen.height_in_pixels
+    if region is None:
+        return 0, 0, screen_width, screen_height
+    x1, y1, x2, y2 = region
+    return (
+        min(max(x1, 0), screen_width),
+        min(max(y1, 0), screen_height),
+        min(max(x2, 0), screen_width),
+        min(max(y2, 0), screen_height),
+    )
+
+
+def _get_raw_frame(
+    region: Optional[Tuple[int, int, int, int]] = None
+) -> np.ndarray:
+    """Returns the display or a region of it as a read only BGRX array"""
+    x1, y1, x2, y2 = clamp_region(region)
+    width = max(x2 - x1, 0)
+    height = max(y2 - y1, 0)
+    if width == 0 or height == 0:
+        return np.zeros((height, width, 4), dtype=np.uint8)
+    raw_image = get_display().screen().root.get_image(
+        x1, y1, width, height, X.ZPixmap, 0xFFFFFFFF
+    )
+    data = np.frombuffer(raw_image.data, dtype=np.uint8)
+    bytes_per_line = data.size // height
+    return data.reshape(height, bytes_per_line)[:, : width * 4].reshape(
+        height, width, 4
+    )
+
+
+def grab_frame(
+    region: Optional[Tuple[int, int, int, int]] = None,
+    grayscale: bool = False,
+) -> np.ndarray:
+    """Returns the current display as a BGR or grayscale array.  When a
+    region (x1, y1, x2, y2) is given only that rectangle is captured."""
+    frame = _get_raw_frame(region)
+    if frame.size == 0:
+        return frame[:, :, 0] if grayscale else frame[:, :, :3]
+    if grayscale:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
@@ -0,0 +1,148 @@
+"""
+Search Hints
+    Remembers where each needle was found on the screen so the image search
+    can look within a small padded window around that location before it
+    searches the entire screen.
+        1. The last successful match of each needle is persisted to
+            resources/search_hints.json so hints survive process restarts
+        2. Needles that were saved with screen_snip and have a static position
+            use their stored snip coordinates until they have been found and
+            are read again when the image json changes
+        3. Hint hits and misses are counted to show how often the window
+            search is enough
+        4. The hints file is read again before it is saved so hints that
+            were written by other workers are merged instead of overwritten
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from . import image_cache, models, serializers
+
+SEARCH_HINT_PADDING = int(os.environ.get("SEARCH_HINT_PADDING", 16))
+
+
+class SearchHintCache:
+    """Per needle location hints that are stored in a json file"""
+
+    def __init__(
+        self,
+        hints_path: Path = models.resources_dir / "search_hints.json",
+        padding: int = SEARCH_HINT_PADDING,
+        images_dir: Path = models.resources_dir / "images",
+    ):
+        self.hints_path = hints_path
+        self.images_dir = images_dir
+        self.padding = padding
+        self.hits = 0
+        self.misses = 0
+        self._hints = None
+        self._snip_hints = {}
+        self._lock = threading.Lock()
+
+    def _read_hints_file(self) -> dict:
+        try:
+            with open(self.hints_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_hints(self) -> dict:
+        if self._hints is None:
+            self._hints = self._read_hints_file()
+        return self._hints
+
+    def _save_hints(self) -> None:
+        temp_path = self.hints_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self._hints, file)
+            os.replace(temp_path, self.hints_path)
+        except OSError as ex:
+            logging.debug(ex)
+
+    def _get_snip_hint(self, needle_file_name: str) -> Optional[dict]:
+        """Reads the snip coordinates from the json file stored next to the
+        needle image by screen_snip.  The hint is cached until the modified
+        time of the json file changes."""
+        image_json_path = (
+            self.images_dir / f"{Path(needle_file_name).stem}.json"
+        )
+        try:
+            modified_time = image_json_path.stat().st_mtime_ns
+        except OSError:
+            modified_time = None
+        cached = self._snip_hints.get(needle_file_name)
+        if cached is None or cached[0] != modified_time:
+            snip_hint = None
+            try:
+                image_json = serializers.load_file(image_json_path)
+                if image_json.get("is_static_position"):
+                    snip_hint = {
+                        "x1": image_json.get("x1", 0),
+                        "y1": image_json.get("y1", 0),
+                    }
+            except (OSError, ValueError):
+                pass
+            cached = (modified_time, snip_hint)
+            self._snip_hints[needle_file_name] = cached
+        return cached[1]
+
+    def get_window(
+        self, needle_file_name: str, needle: image_cache.Needle
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """Returns the padded (x1, y1, x2, y2) window where the needle is
+        expected to be"""
+        with self._lock:
+            hint = self._load_hints().get(needle_file_name)
+        hint = hint or self._get_snip_hint(needle_file_name)
+        if not hint:
+            return None
+        x1 = max(hint["x1"] - self.padding, 0)
+        y1 = max(hint["y1"] - self.padding, 0)
+        x2 = hint["x1"] + needle.width + self.padding
+        y2 = hint["y1"] + needle.height + self.padding
+        return x1, y1, x2, y2
+
+    def record_hit(self) -> None:
+        self.hits += 1
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def update(
+        self,
+        needle_file_name: str,
+        x: float,
+        y: float,
+        needle: image_cache.Needle,
+    ) -> None:
+        """Stores the top left corner of a match found at center (x, y) and
+        only writes the file when the location changed.  The file is read
+        again before it is saved to keep the hints of other workers."""
+        hint = {
+            "x1": int(round(x - needle.width / 2)),
+            "y1": int(round(y - needle.height / 2)),
+        }
+        with self._lock:
+            hints = self._load_hints()
+            if hints.get(needle_file_name) == hint:
+                return
+            self._hints = self._read_hints_file()
+            self._hints[needle_file_name] = hint
+            self._save_hints()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._load_hints()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+hint_cache = SearchHintCache()
@@ -0,0 +1,76 @@
+"""
+Serializers
+    Encodes and decodes the resources that are stored in files and redis.
+        1. pretty - indented json which is how resources were always stored
+        2. compact - json without indentation or whitespace
+        3. msgpack - MessagePack which is smaller and faster to encode and
+            decode than json
+        4. The format is detected when bytes are decoded so files that were
+            written in any format keep loading after the format is changed
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RESOURCE_FORMAT = os.environ.get("RESOURCE_FORMAT", "pretty")
+SCREEN_DATA_FORMAT = os.environ.get("SCREEN_DATA_FORMAT", "compact")
+FORMATS = ("pretty", "compact", "msgpack")
+"""Json documents start with one of these bytes after any whitespace.  None
+of them starts a MessagePack map or array."""
+JSON_START_BYTES = b"{["
+
+
+def validate_format(resource_format: str) -> None:
+    if resource_format not in FORMATS:
+        raise ValueError(f"Invalid resource format: {resource_format}")
+    if resource_format == "msgpack" and msgpack is None:
+        raise ValueError("The msgpack format needs the msgpack package")
+
+
+def dumps(obj: Any, resource_format: str = RESOURCE_FORMAT) -> bytes:
+    validate_format(resource_format)
+    if resource_format == "msgpack":
+        return msgpack.packb(obj, use_bin_type=True)
+    if resource_format == "compact":
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    return json.dumps(obj, indent=6).encode("utf-8")
+
+
+def detect_format(data: bytes) -> str:
+    """Returns json or msgpack for the encoded bytes of a resource"""
+    stripped = data.lstrip()
+    if not stripped or stripped[0] in JSON_START_BYTES:
+        return "json"
+    return "msgpack"
+
+
+def loads(data: bytes) -> Any:
+    if detect_format(data) == "json":
+        return json.loads(data)
+    if msgpack is None:
+        raise ValueError("Reading msgpack resources needs the msgpack package")
+    return msgpack.unpackb(data, raw=False)
+
+
+def dump_file(
+    obj: Any,
+    file_path: Path,
+    resource_format: str = RESOURCE_FORMAT,
+    exclusive: bool = False,
+) -> None:
+    """Writes a resource to a file.  An exclusive write raises
+    FileExistsError when the file already exists."""
+    data = dumps(obj, resource_format)
+    with open(file_path, "xb" if exclusive else "wb") as file:
+        file.write(data)
+
+
+def load_file(file_path: Path) -> Any:
+    with open(file_path, "rb") as file:
+        return loads(file.read())
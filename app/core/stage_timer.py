@@ -0,0 +1,84 @@
+"""
+Stage Timer
+    Measures how long each stage of a pipeline such as capture_screen_data
+    takes so it is clear where the time goes.
+        1. A stage timer records the duration of every stage of one run
+        2. Finished runs are added to the stage stats which report the count,
+            mean and max duration of each stage for every pipeline
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageStats:
+    """Duration totals of every stage of every pipeline"""
+
+    def __init__(self):
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def record(self, pipeline: str, timings: dict) -> None:
+        with self._lock:
+            stages = self._pipelines.setdefault(pipeline, {})
+            for stage, duration in timings.items():
+                count, total, maximum = stages.get(stage, (0, 0.0, 0.0))
+                stages[stage] = (
+                    count + 1,
+                    total + duration,
+                    max(maximum, duration),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pipelines.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                pipeline: {
+                    stage: {
+                        "count": count,
+                        "mean_ms": round(total / count, 3),
+                        "max_ms": round(maximum, 3),
+                    }
+                    for stage, (count, total, maximum) in stages.items()
+                }
+                for pipeline, stages in self._pipelines.items()
+            }
+
+
+stage_stats = StageStats()
+
+
+class StageTimer:
+    """Records the duration of each stage of one run of a pipeline in
+    milliseconds"""
+
+    def __init__(self, pipeline: str, stats: StageStats = stage_stats):
+        self.pipeline = pipeline
+        self.stats = stats
+        self.timings = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + duration
+
+    def finish(self) -> dict:
+        """Adds the run to the stage stats and returns its timings with the
+        total duration"""
+        self.timings["total"] = (time.perf_counter() - self._start) * 1000
+        self.stats.record(self.pipeline, self.timings)
+        timings = {
+            stage: round(duration, 3)
+            for stage, duration in self.timings.items()
+        }
+        logging.debug({"pipeline": self.pipeline, "timings": timings})
+        return timings
@@ -0,0 +1,61 @@
+"""
+Compares the accuracy and speed of the image search methods by placing the
+bundled test images at random positions within a 1920x1080 haystack.
+
+    cd app && python3 -m scripts.benchmark_image_search
+"""
+import logging
+import statistics
+import time
+
+import numpy as np
+
+from core import image_cache, image_matching
+from core.constants import IMAGE_SEARCH_METHODS
+
+NEEDLES = ("test_image.png", "test_image_present_1.png")
+NUM_TRIALS = 20
+
+
+def make_haystack(rng: np.random.RandomState, needle: image_cache.Needle):
+    """Noisy gradient background with the needle pasted at a random spot"""
+    gradient = np.linspace(40, 200, 1920, dtype=np.float32)
+    haystack = np.tile(gradient, (1080, 1)) + rng.normal(0, 8, (1080, 1920))
+    haystack = np.clip(haystack, 0, 255).astype(np.uint8)
+    x = rng.randint(0, 1920 - needle.width)
+    y = rng.randint(0, 1080 - needle.height)
+    haystack[y : y + needle.height, x : x + needle.width] = needle.grayscale
+    return haystack, x + needle.width / 2, y + needle.height / 2
+
+
+def benchmark_image_search():
+    logging.disable(logging.DEBUG)
+    for needle_file_name in NEEDLES:
+        needle = image_cache.needle_cache.get(
+            image_matching.image_dir / needle_file_name
+        )
+        rng = np.random.RandomState(0)
+        trials = [make_haystack(rng, needle) for _ in range(NUM_TRIALS)]
+        for method in IMAGE_SEARCH_METHODS:
+            timings = []
+            num_found = 0
+            for haystack, center_x, center_y in trials:
+                start = time.perf_counter()
+                match = image_matching.find_needle(
+                    needle_file_name, haystack, method=method
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+                if (
+                    abs(match.x - center_x) <= 1
+                    and abs(match.y - center_y) <= 1
+                ):
+                    num_found += 1
+            print(
+                f"{needle_file_name} ({needle.width}x{needle.height}) "
+                f"{method}: {num_found}/{NUM_TRIALS} found, "
+                f"median {statistics.median(timings):.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    benchmark_image_search()
@@ -0,0 +1,79 @@
+"""
+Converts the stored actions, tasks, images and screen data to another
+resource format.  Files are read in whatever format they were written in and
+replaced atomically so the API can keep running during the conversion.  Set
+RESOURCE_FORMAT or SCREEN_DATA_FORMAT to the same format afterwards so new
+resources are written in it too.
+
+    cd app && python3 -m scripts.convert_resources <pretty|compact|msgpack>
+"""
+import argparse
+import logging
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+from core import models, serializers
+
+RESOURCE_DIRS = ["actions", "tasks", "images", "screen_data"]
+
+
+def convert_file(file_path: Path, resource_format: str) -> int:
+    """Returns the number of bytes saved by the conversion"""
+    data = file_path.read_bytes()
+    converted = serializers.dumps(serializers.loads(data), resource_format)
+    if converted == data:
+        return 0
+    file_mode = stat.S_IMODE(file_path.stat().st_mode)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=file_path.parent)
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(converted)
+        """mkstemp creates the file readable by its owner only so the mode
+        of the original file is kept"""
+        os.chmod(temp_path, file_mode)
+        os.replace(temp_path, file_path)
+    except OSError:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return len(data) - len(converted)
+
+
+def convert_resources(resource_dir: Path, resource_format: str) -> dict:
+    converted = 0
+    saved_bytes = 0
+    for file_path in resource_dir.glob("*.json"):
+        try:
+            saved_bytes += convert_file(file_path, resource_format)
+            converted += 1
+        except (OSError, ValueError) as ex:
+            logging.warning(f"Skipped {file_path}: {ex}")
+    return {"converted": converted, "saved_bytes": saved_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("resource_format", choices=serializers.FORMATS)
+    parser.add_argument(
+        "--dirs",
+        nargs="+",
+        default=RESOURCE_DIRS,
+        help="Resource directories to convert",
+    )
+    args = parser.parse_args()
+    serializers.validate_format(args.resource_format)
+    logging.disable(logging.DEBUG)
+
+    for resource_dir in args.dirs:
+        result = convert_resources(
+            models.resources_dir / resource_dir, args.resource_format
+        )
+        print(
+            f"{resource_dir}: converted {result['converted']} files, "
+            f"saved {result['saved_bytes']} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Learns a glyph set for the glyph OCR mode from labelled ScreenData captures.
+Each capture is labelled with the text of its screen objects unless the
+labels are given with --text in the same order as the screen data ids.
+
+    cd app && python3 -m scripts.learn_glyphs <glyph_set> <screen_data_id>...
+"""
+import argparse
+
+from core import glyph_recognizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("glyph_set")
+    parser.add_argument("screen_data_ids", nargs="+")
+    parser.add_argument("--text", action="append", help="Label of a capture")
+    args = parser.parse_args()
+    texts = args.text or [None] * len(args.screen_data_ids)
+    if len(texts) != len(args.screen_data_ids):
+        raise SystemExit("Give one --text for every screen data id")
+
+    samples = [
+        glyph_recognizer.load_screen_data_sample(screen_data_id, text)
+        for screen_data_id, text in zip(args.screen_data_ids, texts)
+    ]
+    glyph_set = glyph_recognizer.learn_glyph_set(samples)
+    glyph_recognizer.glyph_recognizer.save_glyph_set(args.glyph_set, glyph_set)
+    print(
+        f"Saved glyph set {args.glyph_set} with characters: "
+        f"{''.join(glyph_set.chars.tolist())}"
+    )
+
+
+if __name__ == "__main__":
+    main()
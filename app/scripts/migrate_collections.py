@@ -0,0 +1,48 @@
+"""
+Copies the actions and tasks of the json collection directories into the
+SQLite collection database.  The json collections are left in place so the
+API and the celery workers keep running on them until COLLECTION_ENGINE is set
+to sqlite, and the migration can be run again to pick up changes that were
+made in the meantime.  Resources that were deleted from a json collection
+since the last run are deleted from the database.
+
+    cd app && python3 -m scripts.migrate_collections
+"""
+import argparse
+import logging
+
+from core import models
+
+
+def migrate_collections(testing: bool = False) -> dict:
+    """Returns the number of resources copied for each collection"""
+    migrated = {}
+    for model_cls in (models.Action, models.Task):
+        json_collection = models.JsonCollectionResource(model_cls, testing)
+        sqlite_collection = models.SqliteCollectionResource(model_cls, testing)
+        count = sqlite_collection.import_json_collection(
+            json_collection.collection_dir
+        )
+        missing_ids = json_collection.get_ids() - sqlite_collection.get_ids()
+        if missing_ids:
+            logging.warning(
+                f"Not migrated {sqlite_collection.table}s: {missing_ids}"
+            )
+        migrated[f"{sqlite_collection.table}s"] = count
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--testing", action="store_true", help="Migrate the test collections"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.DEBUG)
+
+    for collection, count in migrate_collections(args.testing).items():
+        print(f"Migrated {count} {collection}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Finds the cheapest OCR profile that reproduces the reference text of a stored
+screen data sample.  The reference text is the text of the screen objects
+that were stored with the screen data unless it is given with --text.  With
+--action-id the chosen profile is saved to the action.
+
+    cd app && python3 -m scripts.tune_ocr_profile <screen_data_id>
+"""
+import argparse
+import logging
+import statistics
+import time
+from collections import Counter
+from typing import List
+
+import cv2
+import numpy as np
+
+from core import api_resources, blob_store, models, ocr_engine, serializers
+from core.constants import OCR_PROFILES
+
+NUM_REPEATS = 3
+
+
+def load_screen_data(screen_data_id: str) -> dict:
+    screen_data_resource = models.ScreenDataResource()
+    screen_data = screen_data_resource.get_screen_data(screen_data_id)
+    if screen_data is None:
+        raise SystemExit(f"Screen data not found: {screen_data_id}")
+    if "screen_objects" not in screen_data:
+        """Screen data that was stored before the bulk screen data storage
+        has one file for each screen object"""
+        screen_data["screen_objects"] = []
+        for screen_obj_id in screen_data.get("screen_obj_ids", []):
+            file_path = screen_data_resource.data_dir / f"{screen_obj_id}.json"
+            try:
+                screen_data["screen_objects"].append(
+                    serializers.load_file(file_path)
+                )
+            except OSError:
+                logging.debug(f"Screen object not found: {screen_obj_id}")
+    return screen_data
+
+
+def decode_image(screen_data: dict) -> np.ndarray:
+    png_bytes = blob_store.read_image_bytes(screen_data)
+    if png_bytes is None:
+        raise SystemExit(f"The screen data has no image: {screen_data['id']}")
+    return cv2.imdecode(np.frombuffer(png_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def tune_ocr_profile(
+    image: np.ndarray,
+    reference_words: List[str],
+    num_repeats: int = NUM_REPEATS,
+) -> List[dict]:
+    """Runs every OCR profile on the image and returns the results sorted
+    from the cheapest to the most expensive profile"""
+    results = []
+    for ocr_profile in OCR_PROFILES:
+        timings = []
+        for _ in range(num_repeats):
+            start = time.perf_counter()
+            words = ocr_engine.ocr_engine.image_to_words(
+                ocr_engine.preprocess(image, ocr_profile)
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+        missing_words = Counter(reference_words) - Counter(
+            word.text for word in words
+        )
+        results.append(
+            {
+                "ocr_profile": ocr_profile,
+                "median_ms": statistics.median(timings),
+                "reproduces_reference": not missing_words,
+                "missing_words": sorted(missing_words.elements()),
+            }
+        )
+    return sorted(results, key=lambda result: result["median_ms"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("screen_data_id")
+    parser.add_argument("--text", help="Reference text of the sample")
+    parser.add_argument("--action-id", help="Action to save the profile to")
+    parser.add_argument("--repeats", type=int, default=NUM_REPEATS)
+    args = parser.parse_args()
+    logging.disable(logging.DEBUG)
+
+    screen_data = load_screen_data(args.screen_data_id)
+    if args.text:
+        reference_words = args.text.split()
+    else:
+        reference_words = [
+            screen_object.get("text")
+            for screen_object in screen_data["screen_objects"]
+        ]
+    if not reference_words:
+        raise SystemExit("The screen data has no reference text")
+
+    image = decode_image(screen_data)
+    results = tune_ocr_profile(image, reference_words, args.repeats)
+    for result in results:
+        print(
+            f"{result['ocr_profile']}: {result['median_ms']:.1f} ms, "
+            f"reproduces reference: {result['reproduces_reference']} "
+            f"{result['missing_words'] or ''}"
+        )
+
+    best_result = next(
+        (result for result in results if result["reproduces_reference"]),
+        None,
+    )
+    if best_result is None:
+        raise SystemExit("No OCR profile reproduces the reference text")
+    ocr_profile = best_result["ocr_profile"]
+    print(f"Cheapest OCR profile: {ocr_profile}")
+
+    if args.action_id:
+        action = api_resources.storage.get_action(args.action_id)
+        action["ocr_profile"] = ocr_profile
+        api_resources.storage.update_action(
+            args.action_id, models.Action(**action)
+        )
+        print(f"Saved OCR profile to action: {args.action_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import json
+from shutil import rmtree
+
+import pytest
+
+from core import api_resources, models
+from core.models import Action, JsonCollectionResource, SqliteCollectionResource
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def action_collection(request, tmp_path):
+    if request.param == "json":
+        collection = JsonCollectionResource(Action, True)
+    else:
+        collection = SqliteCollectionResource(
+            Action, True, db_path=tmp_path / "collections.db"
+        )
+    for i in range(5):
+        function = "click" if i % 2 else "move_to"
+        collection.add_collection(Action(id=f"a{i}", function=function))
+    collection.add_collection(Action(id="b0", function="click"))
+    yield collection
+    rmtree(collection.collection_dir, ignore_errors=True)
+
+
+class TestAPIResources:
+    def test_list_collection(self, action_collection):
+        page = api_resources.list_collection(action_collection, limit=4)
+        assert [action["id"] for action in page["data"]] == [
+            "a0",
+            "a1",
+            "a2",
+            "a3",
+        ]
+        assert page["next_cursor"] == "a3"
+        page = api_resources.list_collection(
+            action_collection, limit=4, cursor=page["next_cursor"]
+        )
+        assert [action["id"] for action in page["data"]] == ["a4", "b0"]
+        assert page["next_cursor"] is None
+
+    def test_list_collection__no_full_copy(self, action_collection):
+        action_collection.get_all_collections = None
+        page = api_resources.list_collection(action_collection, limit=1)
+        assert [action["id"] for action in page["data"]] == ["a0"]
+
+    def test_list_collection__filters(self, action_collection):
+        page = api_resources.list_collection(
+            action_collection, function="click", id_prefix="a"
+        )
+        assert [action["id"] for action in page["data"]] == ["a1", "a3"]
+        page = api_resources.list_collection(action_collection, id_prefix="b")
+        assert [action["id"] for action in page["data"]] == ["b0"]
+
+    def test_list_collection__fields(self, action_collection):
+        page = api_resources.list_collection(
+            action_collection, limit=1, fields=["id", "function"]
+        )
+        assert page["data"] == [{"id": "a0", "function": "move_to"}]
+
+    def test_stream_collection(self, action_collection):
+        lines = list(
+            api_resources.stream_collection(
+                action_collection, fields=["id"], function="move_to"
+            )
+        )
+        assert [json.loads(line) for line in lines] == [
+            {"id": "a0"},
+            {"id": "a2"},
+            {"id": "a4"},
+        ]
+        assert all(line.endswith("\n") for line in lines)
+
+    def test_stream_collection__batches(self, action_collection, monkeypatch):
+        monkeypatch.setattr(models, "SQLITE_ITER_BATCH_SIZE", 2)
+        lines = list(api_resources.stream_collection(action_collection))
+        assert len(lines) == 6
@@ -1,5 +1,12 @@
+import os
+
 import pytest
-from core.async_process_controller import get_image_present_result
+from core import image_matching
+from core.async_process_controller import (
+    ImageSearchPool,
+    evaluate_image_conditional,
+    get_image_present_result,
+)
 
 
 class TestAsyncProcessController:
@@ -32,3 +39,49 @@ class TestAsyncProcessController:
         }
         result = await get_image_present_result(test_action)
         assert result == False
+
+    @pytest.mark.asyncio
+    async def test_evaluate_image_conditional__shared_haystack(self):
+        pool = ImageSearchPool(max_workers=1, max_jobs=1)
+        haystack = image_matching.load_grayscale_haystack("test_image.png")
+        for _ in range(2):
+            search_result = await evaluate_image_conditional(
+                ["test_image.png"], haystack, pool=pool
+            )
+            assert search_result["result"] == True
+        assert pool.recycles == 1
+        pool.shutdown()
+
+    def test_image_search_pool__health_check(self):
+        pool = ImageSearchPool(max_workers=1)
+        pool.start()
+        health = pool.health_check()
+        pool.shutdown()
+        assert health["healthy"] == True
+        assert health["restarts"] == 0
+
+    @pytest.mark.asyncio
+    async def test_image_search_pool__run_after_concurrent_recycle(self):
+        pool = ImageSearchPool(max_workers=1, max_jobs=1)
+        executor, future = pool.submit(os.getpid)
+        future.result()
+        pool.restart(executor)
+        search_result = await pool.run(
+            image_matching.image_search_many,
+            ["test_image.png"],
+            "test_image.png",
+        )
+        pool.shutdown()
+        assert search_result["result"] == True
+        assert pool.restarts == 1
+
+    def test_image_search_pool__restart_stale_executor(self):
+        pool = ImageSearchPool(max_workers=1)
+        pool.start()
+        executor, _ = pool.submit(os.getpid)
+        assert pool.restart(executor) == True
+        assert pool.restart(executor) == False
+        health = pool.health_check()
+        pool.shutdown()
+        assert health["healthy"] == True
+        assert health["restarts"] == 1
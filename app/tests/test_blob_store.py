@@ -0,0 +1,61 @@
+import base64
+
+import pytest
+
+from core import blob_store
+from core.blob_store import BlobStore
+
+
+class TestBlobStore:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return BlobStore(directory=tmp_path)
+
+    def test_put_and_get(self, store):
+        blob_id = store.put(b"png bytes")
+        assert len(blob_id) == 64
+        assert store.has(blob_id)
+        assert store.get(blob_id) == b"png bytes"
+        assert store.get_base64(blob_id) == base64.b64encode(
+            b"png bytes"
+        ).decode("utf-8")
+
+    def test_put__deduplicates(self, store):
+        assert store.put(b"snip") == store.put(b"snip")
+        assert store.put(b"other snip") != store.put(b"snip")
+        assert store.stats() == {"writes": 2, "deduplicated": 2}
+
+    def test_put__file_mode(self, store):
+        blob_id = store.put(b"snip")
+        assert store.get_path(blob_id).stat().st_mode & 0o777 == 0o644
+
+    def test_get__dne(self, store):
+        assert store.get("0" * 64) is None
+        assert store.get("../../actions") is None
+        assert not store.has("../../actions")
+
+    def test_delete(self, store):
+        blob_id = store.put(b"snip")
+        store.delete(blob_id)
+        assert not store.has(blob_id)
+        assert store.delete(blob_id) == {
+            "data": f"Blob does not exist: {blob_id}"
+        }
+
+    def test_read_image_bytes(self):
+        blob_id = blob_store.blob_store.put(b"blob image")
+        assert blob_store.read_image_bytes({"blob_id": blob_id}) == (
+            b"blob image"
+        )
+        legacy_resource = {
+            "base64str": base64.b64encode(b"legacy image").decode("utf-8")
+        }
+        assert blob_store.read_image_bytes(legacy_resource) == b"legacy image"
+        assert blob_store.read_image_bytes({}) is None
+        blob_store.blob_store.delete(blob_id)
+
+    def test_inline_base64(self):
+        blob_id = blob_store.blob_store.put(b"blob image")
+        resource = blob_store.inline_base64({"blob_id": blob_id})
+        assert base64.b64decode(resource["base64str"]) == b"blob image"
+        blob_store.blob_store.delete(blob_id)
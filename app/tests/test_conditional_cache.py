@@ -0,0 +1,59 @@
+import numpy as np
+
+from core import conditional_cache
+from core.conditional_cache import ConditionalResultCache
+
+
+class TestConditionalCache:
+    action = {
+        "id": 1,
+        "function": "capture_screen_data",
+        "images": ["test_image.png"],
+        "image_conditions": ["if_image_present"],
+    }
+
+    def test_action_digest__conditional_fields(self):
+        digest = conditional_cache.action_digest(self.action)
+        assert digest == conditional_cache.action_digest(
+            {**self.action, "sleep_duration": 5}
+        )
+        assert digest != conditional_cache.action_digest(
+            {**self.action, "images": ["test_image_present_1.png"]}
+        )
+
+    def test_content_digest(self):
+        frame = np.zeros((10, 20), np.uint8)
+        digest = conditional_cache.content_digest(frame)
+        assert digest == conditional_cache.content_digest(frame.copy())
+        assert digest != conditional_cache.content_digest(frame.reshape(20, 10))
+        frame[5, 5] = 1
+        assert digest != conditional_cache.content_digest(frame)
+
+    def test_get__hit_and_miss(self):
+        cache = ConditionalResultCache()
+        key = conditional_cache.get_cache_key(
+            self.action, np.zeros((10, 10), np.uint8)
+        )
+        assert cache.get(key) is None
+        cache.set(key, {"result": False})
+        assert cache.get(key) == {"result": False}
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_get__expired(self):
+        cache = ConditionalResultCache(ttl=0)
+        cache.set(("action", "frame"), {"result": True})
+        assert cache.get(("action", "frame")) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_set__evicts_least_recently_used(self):
+        cache = ConditionalResultCache(max_entries=2)
+        cache.set(("action", "frame_1"), {"result": True})
+        cache.set(("action", "frame_2"), {"result": True})
+        cache.get(("action", "frame_1"))
+        cache.set(("action", "frame_3"), {"result": True})
+        assert cache.get(("action", "frame_1")) == {"result": True}
+        assert cache.get(("action", "frame_2")) is None
+        assert cache.stats()["entries"] == 2
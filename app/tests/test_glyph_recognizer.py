@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+import pytest
+
+from core import glyph_recognizer
+from core.glyph_recognizer import GlyphRecognizer
+
+
+def render_text(text: str) -> np.ndarray:
+    image = np.full((30, 20 * len(text) + 20, 3), 240, np.uint8)
+    cv2.putText(
+        image, text, (5, 22), cv2.FONT_HERSHEY_PLAIN, 1.5, (20, 20, 20), 2
+    )
+    return image
+
+
+class TestGlyphRecognizer:
+    samples = [
+        (render_text("0123456789"), "0123456789"),
+        (render_text("9876543210.-"), "9876543210.-"),
+    ]
+
+    @pytest.fixture
+    def recognizer(self, tmp_path):
+        recognizer = GlyphRecognizer(directory=tmp_path)
+        recognizer.save_glyph_set(
+            "digits", glyph_recognizer.learn_glyph_set(self.samples)
+        )
+        return recognizer
+
+    def test_learn_glyph_set(self):
+        glyph_set = glyph_recognizer.learn_glyph_set(self.samples)
+        assert "".join(glyph_set.chars.tolist()) == "-.0123456789"
+        assert glyph_set.templates.shape[0] == 12
+
+    def test_learn_glyph_set__mislabelled(self):
+        with pytest.raises(ValueError):
+            glyph_recognizer.learn_glyph_set([(render_text("123"), "12")])
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ("4096", ["4096"]),
+            ("1100", ["1100"]),
+            ("-3.75", ["-3.75"]),
+            ("12 345", ["12", "345"]),
+        ],
+    )
+    def test_recognize(self, recognizer, text, expected):
+        words = recognizer.recognize(render_text(text), "digits")
+        assert [word.text for word in words] == expected
+
+    def test_recognize__box(self, recognizer):
+        word = recognizer.recognize(render_text("42"), "digits")[0]
+        assert 0 < word.x < 10
+        assert word.width < 40
+        assert word.confidence > 90
+
+    def test_recognize__low_confidence(self, recognizer):
+        assert recognizer.recognize(render_text("AB"), "digits") is None
+        assert recognizer.stats()["fallbacks"] == 1
+
+    def test_recognize__no_glyph_set(self, recognizer):
+        assert recognizer.recognize(render_text("42"), "dne") is None
+        assert recognizer.recognize(render_text("42"), None) is None
+
+    def test_recognize__empty(self, recognizer):
+        assert recognizer.recognize(render_text(""), "digits") == []
+
+    def test_get_glyph_set_version(self, recognizer):
+        version = recognizer.get_glyph_set_version("digits")
+        assert version is not None
+        recognizer.save_glyph_set(
+            "digits", glyph_recognizer.learn_glyph_set(self.samples[:1])
+        )
+        assert recognizer.get_glyph_set_version("digits") != version
+        assert recognizer.get_glyph_set_version("dne") is None
@@ -0,0 +1,50 @@
+import os
+import shutil
+
+from core import models
+from core.image_cache import NeedleCache
+
+
+class TestNeedleCache:
+    test_image_path = models.resources_dir / "images" / "test_image.png"
+
+    def test_get__hit_after_miss(self, tmp_path):
+        needle_path = tmp_path / "needle.png"
+        shutil.copy(self.test_image_path, needle_path)
+        cache = NeedleCache()
+        needle = cache.get(needle_path)
+        assert needle.width == 132
+        assert needle.height == 32
+        assert needle.grayscale.ndim == 2
+        assert cache.get(needle_path) is needle
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_get__modified_file_invalidates(self, tmp_path):
+        needle_path = tmp_path / "needle.png"
+        shutil.copy(self.test_image_path, needle_path)
+        cache = NeedleCache()
+        needle = cache.get(needle_path)
+        stat = os.stat(needle_path)
+        os.utime(needle_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert cache.get(needle_path) is not needle
+        assert cache.stats()["misses"] == 2
+        assert cache.stats()["entries"] == 1
+
+    def test_get__evicts_least_recently_used(self, tmp_path):
+        needle_paths = []
+        for index in range(3):
+            needle_path = tmp_path / f"needle_{index}.png"
+            shutil.copy(self.test_image_path, needle_path)
+            needle_paths.append(needle_path)
+        cache = NeedleCache(max_bytes=132 * 32 * 2)
+        for needle_path in needle_paths:
+            cache.get(needle_path)
+        assert cache.stats()["entries"] == 2
+        assert cache.stats()["evictions"] == 1
+        cache.get(needle_paths[0])
+        assert cache.stats()["misses"] == 4
+
+    def test_get__file_dne(self, tmp_path):
+        cache = NeedleCache()
+        assert cache.get(tmp_path / "dne.png") is None
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from core import image_matching
+
+
+class TestImageMatching:
+    haystack_file_name = "test_image.png"
+
+    def test_find_needle(self):
+        haystack = image_matching.load_grayscale_haystack(
+            self.haystack_file_name
+        )
+        match = image_matching.find_needle("test_image.png", haystack)
+        assert match.found
+        assert (match.x, match.y) == (66, 16)
+        assert match.score > 0.99
+
+    def test_find_needle__needle_dne(self):
+        haystack = image_matching.load_grayscale_haystack(
+            self.haystack_file_name
+        )
+        match = image_matching.find_needle("dne.png", haystack)
+        assert not match.found
+
+    def test_image_search_many__any(self):
+        search_result = image_matching.image_search_many(
+            ["test_image.png", "test_image_present_1.png"],
+            self.haystack_file_name,
+            mode="any",
+        )
+        assert search_result["result"]
+        assert len(search_result["matches"]) == 1
+        assert search_result["matches"][0]["needle"] == "test_image.png"
+
+    def test_image_search_many__all(self):
+        search_result = image_matching.image_search_many(
+            ["test_image.png", "test_image_present_1.png"],
+            self.haystack_file_name,
+            mode="all",
+        )
+        assert not search_result["result"]
+        assert len(search_result["matches"]) == 2
+        assert search_result["matches"][1]["x"] == -1
+
+    def test_image_search_many__invalid_mode(self):
+        with pytest.raises(ValueError):
+            image_matching.image_search_many(
+                ["test_image.png"], self.haystack_file_name, mode="none"
+            )
+
+    def test_image_search_all(self):
+        needle = image_matching.load_grayscale_haystack("test_image.png")
+        haystack = np.zeros((200, 400), dtype=np.uint8)
+        haystack[10:42, 20:152] = needle
+        haystack[100:132, 200:332] = needle
+        matches = image_matching.image_search_all("test_image.png", haystack)
+        assert len(matches) == 2
+        assert {(match.x, match.y) for match in matches} == {
+            (86, 26),
+            (266, 116),
+        }
+        assert all(match.score > 0.99 for match in matches)
+
+    def test_image_search_all__max_matches(self):
+        needle = image_matching.load_grayscale_haystack("test_image.png")
+        haystack = np.zeros((200, 400), dtype=np.uint8)
+        haystack[10:42, 20:152] = needle
+        haystack[100:132, 200:332] = needle
+        matches = image_matching.image_search_all(
+            "test_image.png", haystack, max_matches=1
+        )
+        assert len(matches) == 1
+
+    def test_find_needle__pyramid(self):
+        needle = image_matching.load_grayscale_haystack("test_image.png")
+        haystack = np.full((400, 600), 120, dtype=np.uint8)
+        haystack[201:233, 303:435] = needle
+        match = image_matching.find_needle(
+            "test_image.png", haystack, method="pyramid"
+        )
+        assert (match.x, match.y) == (369, 217)
+        assert match.score > 0.99
+
+    def test_find_needle__invalid_method(self):
+        haystack = image_matching.load_grayscale_haystack(
+            self.haystack_file_name
+        )
+        with pytest.raises(ValueError):
+            image_matching.find_needle(
+                "test_image.png", haystack, method="none"
+            )
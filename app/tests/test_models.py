@@ -1,9 +1,27 @@
+import json
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from shutil import rmtree
 import uuid
 
-from core.models import Action, Task, JsonCollectionResource
+import pytest
+
+from core import serializers
+from core.models import (
+    Action,
+    JsonCollectionResource,
+    ScreenData,
+    ScreenDataResource,
+    ScreenObject,
+    SqliteCollectionResource,
+    Task,
+)
+
+
+def add_action(action: dict) -> str:
+    return JsonCollectionResource(Action, True).add_collection(action).id
 
 
 class TestModels:
@@ -36,8 +54,8 @@ class TestModels:
 
     @classmethod
     def teardown_method(cls):
-        rmtree(cls.action_collection.collection_dir)
-        rmtree(cls.task_collection.collection_dir)
+        rmtree(cls.action_collection.collection_dir, ignore_errors=True)
+        rmtree(cls.task_collection.collection_dir, ignore_errors=True)
 
     def test_json_collection_resource(self):
         test_action_obj1 = Action(**self.test_action1)
@@ -56,3 +74,381 @@ class TestModels:
         assert set(self.task_collection.get_collection(self.task_id)) >= set(
             self.test_task
         )
+
+    def test_json_collection_resource__id_index(self):
+        action_collection = JsonCollectionResource(Action, True)
+        assert not action_collection.has_collection(self.action_id1)
+        action_collection.add_collection(Action(**self.test_action1))
+        assert action_collection.has_collection(self.action_id1)
+
+        updated_action = Action(**{**self.test_action1, "id": self.action_id2})
+        action_collection.update_collection(self.action_id1, updated_action)
+        assert not action_collection.has_collection(self.action_id1)
+        assert action_collection.has_collection(self.action_id2)
+        assert set(action_collection.get_all_collections()) == {self.action_id2}
+
+        action_collection.delete_collection(self.action_id2)
+        assert not action_collection.has_collection(self.action_id2)
+        assert action_collection.get_ids() == set()
+
+    def test_json_collection_resource__id_added_by_other_process(self):
+        action_collection = JsonCollectionResource(Action, True)
+        assert action_collection.get_ids() == set()
+        JsonCollectionResource(Action, True).add_collection(
+            Action(**self.test_action1)
+        )
+        assert action_collection.has_collection(self.action_id1)
+        assert action_collection.has_collection(None) is False
+
+    def test_json_collection_resource__id_deleted_by_other_process(self):
+        action_collection = JsonCollectionResource(Action, True)
+        action_collection.add_collection(Action(**self.test_action1))
+        assert action_collection.has_collection(self.action_id1)
+        JsonCollectionResource(Action, True).delete_collection(self.action_id1)
+        assert not action_collection.has_collection(self.action_id1)
+        assert self.action_id1 not in action_collection.get_ids()
+
+    def test_json_collection_resource__id_collision(self):
+        action_collection = JsonCollectionResource(Action, True)
+        JsonCollectionResource(Action, True).add_collection(
+            Action(**self.test_action1)
+        )
+        response = action_collection.add_collection(
+            Action(**{**self.test_action1, "function": "click"})
+        )
+        assert response.id != self.action_id1
+        assert (
+            action_collection.get_collection(self.action_id1)["function"]
+            == "move_to"
+        )
+
+    def test_json_collection_resource__concurrent_add(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            ids = list(executor.map(add_action, [self.test_action1] * 20))
+        assert len(set(ids)) == 20
+        assert JsonCollectionResource(Action, True).get_ids() >= set(ids)
+
+    def test_json_collection_resource__task_id_collision(self):
+        task_collection = JsonCollectionResource(Task, True)
+        task_collection.add_collection(Task(**self.test_task))
+        other_task = Task(id=f"{self.task_id}-other")
+        task_collection.add_collection(other_task)
+        response = task_collection.update_collection(
+            other_task.id, Task(id=self.task_id)
+        )
+        assert response.id == f"{self.task_id}-1"
+        assert task_collection.get_collection(self.task_id)[
+            "action_id_list"
+        ] == [self.action_id1, self.action_id2]
+        assert not task_collection.has_collection(other_task.id)
+
+    def test_json_collection_resource__snapshot(self):
+        action_collection = JsonCollectionResource(Action, True)
+        action_collection.add_collection(Action(**self.test_action1))
+        action_collection.add_collection(Action(**self.test_action2))
+        snapshot = action_collection.get_all_collections()
+        assert set(snapshot) == {self.action_id1, self.action_id2}
+
+        """Files that did not change are not read again"""
+        file_path = action_collection.collection_dir / f"{self.action_id1}.json"
+        stat = file_path.stat()
+        file_path.write_text(
+            file_path.read_text().replace("move_to", "drag_to")
+        )
+        os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        snapshot = action_collection.get_all_collections(force_refresh=True)
+        assert snapshot[self.action_id1]["function"] == "move_to"
+
+        """Changes of other processes are read on a forced refresh"""
+        file_path.write_text(json.dumps({**self.test_action1, "x1": 10}))
+        snapshot = action_collection.get_all_collections(force_refresh=True)
+        assert snapshot[self.action_id1]["x1"] == 10
+
+        (action_collection.collection_dir / f"{self.action_id2}.json").unlink()
+        snapshot = action_collection.get_all_collections(force_refresh=True)
+        assert set(snapshot) == {self.action_id1}
+
+    def test_json_collection_resource__snapshot_sees_own_writes(self):
+        action_collection = JsonCollectionResource(Action, True)
+        assert action_collection.get_all_collections() == {}
+        action_collection.add_collection(Action(**self.test_action1))
+        assert set(action_collection.get_all_collections()) == {self.action_id1}
+        action_collection.delete_collection(self.action_id1)
+        assert action_collection.get_all_collections() == {}
+
+    def test_json_collection_resource__any_format(self):
+        action_collection = JsonCollectionResource(Action, True)
+        for resource_format, action in zip(
+            ("pretty", "msgpack"), (self.test_action1, self.test_action2)
+        ):
+            serializers.dump_file(
+                Action(**action).dict(),
+                action_collection.collection_dir / f"{action['id']}.json",
+                resource_format,
+            )
+        assert (
+            action_collection.get_collection(self.action_id2)["function"]
+            == "click"
+        )
+        assert set(action_collection.get_all_collections()) == {
+            self.action_id1,
+            self.action_id2,
+        }
+
+    def test_screen_data_resource(self):
+        screen_data_resource = ScreenDataResource(testing=True)
+        screen_objects = [
+            ScreenObject(
+                id=f"{self.task_id}{i}",
+                text="Parameters",
+                x1=i,
+                y1=0,
+                x2=9,
+                y2=9,
+            )
+            for i in range(3)
+        ]
+        screen_data = ScreenData(
+            id=self.task_id,
+            base64str="",
+            screen_obj_ids=[
+                screen_object.id for screen_object in screen_objects
+            ],
+        )
+        try:
+            response = screen_data_resource.store_resource(
+                screen_data, screen_objects
+            )
+            assert response == {"data": f"Saved: {self.task_id}.json"}
+            assert len(list(screen_data_resource.data_dir.iterdir())) == 2
+            stored_screen_data = screen_data_resource.get_screen_data(
+                self.task_id
+            )
+            assert (
+                stored_screen_data["screen_obj_ids"]
+                == screen_data.screen_obj_ids
+            )
+            assert len(stored_screen_data["screen_objects"]) == 3
+
+            reloaded_resource = ScreenDataResource(testing=True)
+            assert (
+                reloaded_resource.get_screen_object(f"{self.task_id}1")["x1"]
+                == 1
+            )
+            assert reloaded_resource.get_screen_object("dne") is None
+        finally:
+            rmtree(screen_data_resource.data_dir)
+
+    def test_screen_data_resource__store_resources(self):
+        screen_data_resource = ScreenDataResource(testing=True)
+        captures = []
+        for i in range(2):
+            screen_object = ScreenObject(
+                id=f"{self.task_id}{i}", x1=0, y1=0, x2=9, y2=9
+            )
+            screen_data = ScreenData(
+                id=f"{self.task_id}-{i}",
+                base64str="",
+                screen_obj_ids=[screen_object.id],
+            )
+            captures.append((screen_data, [screen_object]))
+        try:
+            response = screen_data_resource.store_resources(captures)
+            assert response == {
+                "data": f"Saved: {self.task_id}-0.json, {self.task_id}-1.json"
+            }
+            index_lines = screen_data_resource.index_path.read_text()
+            assert len(index_lines.splitlines()) == 2
+            reloaded_resource = ScreenDataResource(testing=True)
+            assert (
+                reloaded_resource.get_screen_data_id(f"{self.task_id}1")
+                == f"{self.task_id}-1"
+            )
+        finally:
+            rmtree(screen_data_resource.data_dir)
+
+    def test_screen_data_resource__derived_screen_object_ids(self):
+        screen_data_resource = ScreenDataResource(testing=True)
+        screen_objects = [
+            ScreenObject(
+                id=ScreenDataResource.screen_object_id(self.task_id, i),
+                x1=i,
+                y1=0,
+                x2=9,
+                y2=9,
+            )
+            for i in range(2)
+        ]
+        screen_data = ScreenData(
+            id=self.task_id,
+            screen_obj_ids=[
+                screen_object.id for screen_object in screen_objects
+            ],
+        )
+        try:
+            screen_data_resource.store_resource(screen_data, screen_objects)
+            assert not screen_data_resource.index_path.exists()
+            reloaded_resource = ScreenDataResource(testing=True)
+            assert (
+                reloaded_resource.get_screen_object(f"{self.task_id}-1")["x1"]
+                == 1
+            )
+            reloaded_resource.delete_resource(self.task_id)
+            assert (
+                reloaded_resource.get_screen_object(f"{self.task_id}-1") is None
+            )
+        finally:
+            rmtree(screen_data_resource.data_dir)
+
+    def test_screen_data_resource__delete_compacts_index(self):
+        screen_data_resource = ScreenDataResource(testing=True)
+        captures = []
+        for i in range(2):
+            screen_object = ScreenObject(
+                id=f"{self.task_id}{i}", x1=0, y1=0, x2=9, y2=9
+            )
+            screen_data = ScreenData(
+                id=f"{self.task_id}-{i}", screen_obj_ids=[screen_object.id]
+            )
+            captures.append((screen_data, [screen_object]))
+        try:
+            screen_data_resource.store_resources(captures)
+            screen_data_resource.delete_resource(f"{self.task_id}-0")
+            index_lines = screen_data_resource.index_path.read_text()
+            assert len(index_lines.splitlines()) == 1
+            assert (
+                screen_data_resource.get_screen_object(f"{self.task_id}0")
+                is None
+            )
+            assert screen_data_resource._screen_data_ids == {
+                f"{self.task_id}1": f"{self.task_id}-1"
+            }
+            assert screen_data_resource.get_screen_object(f"{self.task_id}1")
+        finally:
+            rmtree(screen_data_resource.data_dir)
+
+    def test_screen_data_resource__legacy_screen_object_file(self):
+        screen_data_resource = ScreenDataResource(testing=True)
+        screen_object = ScreenObject(id=self.task_id, x1=1, y1=2, x2=9, y2=9)
+        try:
+            (screen_data_resource.data_dir / f"{self.task_id}.json").write_text(
+                json.dumps(screen_object.dict())
+            )
+            assert (
+                screen_data_resource.get_screen_object(self.task_id)["y1"] == 2
+            )
+        finally:
+            rmtree(screen_data_resource.data_dir)
+
+
+class TestCollectionEngines:
+    """Behaviour that has to be the same for every collection engine"""
+
+    task_id = str(uuid.uuid4())
+
+    @pytest.fixture(params=["json", "sqlite"])
+    def task_collection(self, request, tmp_path):
+        if request.param == "sqlite":
+            yield SqliteCollectionResource(
+                Task, True, db_path=tmp_path / "collections.db"
+            )
+            return
+        task_collection = JsonCollectionResource(Task, True)
+        yield task_collection
+        rmtree(task_collection.collection_dir, ignore_errors=True)
+
+    def test_update_collection(self, task_collection):
+        task_collection.add_collection(Task(id=self.task_id))
+        response = task_collection.update_collection(
+            self.task_id, Task(id=self.task_id, action_id_list=["1"])
+        )
+        assert response.id == self.task_id
+        assert task_collection.get_ids() == {self.task_id}
+        assert task_collection.get_collection(self.task_id)[
+            "action_id_list"
+        ] == ["1"]
+
+    def test_update_collection__id_collision(self, task_collection):
+        task_collection.add_collection(Task(id=self.task_id))
+        other_task = task_collection.add_collection(
+            Task(id=f"{self.task_id}-other", action_id_list=["1"])
+        )
+        response = task_collection.update_collection(
+            other_task.id, Task(id=self.task_id, action_id_list=["1"])
+        )
+        assert response.id == f"{self.task_id}-1"
+        assert task_collection.get_ids() == {self.task_id, response.id}
+        assert (
+            task_collection.get_collection(self.task_id)["action_id_list"] == []
+        )
+
+
+class TestSqliteCollectionResource:
+    action_id1 = f"{uuid.uuid4()}1"
+    action_id2 = f"{uuid.uuid4()}2"
+    test_action1 = {"id": action_id1, "function": "move_to", "x1": 0, "y1": 0}
+
+    @pytest.fixture
+    def action_collection(self, tmp_path):
+        return SqliteCollectionResource(
+            Action, True, db_path=tmp_path / "collections.db"
+        )
+
+    def test_sqlite_collection_resource(self, action_collection):
+        assert not action_collection.has_collection(self.action_id1)
+        response = action_collection.add_collection(Action(**self.test_action1))
+        assert response.id == self.action_id1
+        assert action_collection.has_collection(self.action_id1)
+        assert set(action_collection.get_collection(self.action_id1)) >= set(
+            self.test_action1
+        )
+        assert action_collection.get_collection("dne") == {
+            "data": "action not found."
+        }
+
+        duplicate = action_collection.add_collection(
+            Action(**self.test_action1)
+        )
+        assert duplicate.id != self.action_id1
+        assert len(action_collection.get_ids()) == 2
+
+    def test_sqlite_collection_resource__update_and_delete(
+        self, action_collection
+    ):
+        action_collection.add_collection(Action(**self.test_action1))
+        updated_action = Action(**{**self.test_action1, "id": self.action_id2})
+        action_collection.update_collection(self.action_id1, updated_action)
+        assert set(action_collection.get_all_collections()) == {self.action_id2}
+
+        assert action_collection.delete_collection(self.action_id2) == {
+            "data": f"Deleted action with id: {self.action_id2}"
+        }
+        assert action_collection.delete_collection(self.action_id2) == {
+            "data": f"action does not exist: {self.action_id2}"
+        }
+        assert action_collection.get_ids() == set()
+
+    def test_sqlite_collection_resource__wal_mode(self, action_collection):
+        journal_mode = action_collection._connect().execute(
+            "PRAGMA journal_mode"
+        )
+        assert journal_mode.fetchone()[0] == "wal"
+
+    def test_import_json_collection(self, action_collection, tmp_path):
+        json_dir = tmp_path / "actions"
+        json_dir.mkdir()
+        for action_id in (self.action_id1, self.action_id2):
+            (json_dir / f"{action_id}.json").write_text(
+                json.dumps({**self.test_action1, "id": action_id})
+            )
+        (json_dir / "broken.json").write_text("{")
+        assert action_collection.import_json_collection(json_dir) == 2
+        assert action_collection.import_json_collection(json_dir) == 2
+        assert action_collection.get_ids() == {
+            self.action_id1,
+            self.action_id2,
+        }
+
+        (json_dir / f"{self.action_id2}.json").unlink()
+        assert action_collection.import_json_collection(json_dir) == 1
+        assert action_collection.get_ids() == {self.action_id1}
@@ -0,0 +1,54 @@
+import numpy as np
+
+from core import ocr_cache
+from core.ocr_cache import OcrResultCache
+from core.ocr_engine import OcrWord
+
+
+class TestOcrCache:
+    region = np.full((20, 40, 3), 200, np.uint8)
+    words = [OcrWord("1200", 2, 3, 30, 12, 96.5)]
+
+    def test_get_cache_key(self):
+        key = ocr_cache.get_cache_key(self.region, "default", "numeric")
+        assert key == ocr_cache.get_cache_key(
+            self.region.copy(), "default", "numeric"
+        )
+        assert key != ocr_cache.get_cache_key(self.region, "fast", "numeric")
+        changed_region = self.region.copy()
+        changed_region[5, 5] = 0
+        assert key != ocr_cache.get_cache_key(
+            changed_region, "default", "numeric"
+        )
+
+    def test_set_and_get(self):
+        cache = OcrResultCache()
+        key = ocr_cache.get_cache_key(self.region, "default", "numeric")
+        assert cache.get(key) is None
+        cache.set(key, self.words, 5)
+        words, scale = cache.get(key)
+        assert words == self.words
+        assert isinstance(words[0], OcrWord)
+        assert scale == 5
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        cache = OcrResultCache(max_bytes=120)
+        cache.set("a", self.words, 1)
+        cache.set("b", self.words, 1)
+        cache.get("a")
+        cache.set("c", self.words, 1)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= 120
+
+    def test_clear(self):
+        cache = OcrResultCache()
+        cache.set("a", [], 1)
+        cache.clear()
+        assert cache.get("a") is None
+        assert cache.stats()["bytes"] == 0
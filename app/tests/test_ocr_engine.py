@@ -0,0 +1,129 @@
+import threading
+import types
+
+import cv2
+import pytest
+
+from core import constants, models, ocr_engine
+from core.ocr_engine import OcrEngine, OcrWord, preprocess
+
+
+class FakeTessBaseAPI:
+    fail_init = False
+
+    def __init__(self, lang):
+        if self.fail_init:
+            raise RuntimeError("Failed to init API")
+        self.ended = False
+
+    def End(self):
+        self.ended = True
+
+
+@pytest.fixture
+def fake_tesserocr(monkeypatch):
+    monkeypatch.setattr(
+        ocr_engine,
+        "tesserocr",
+        types.SimpleNamespace(PyTessBaseAPI=FakeTessBaseAPI),
+    )
+    monkeypatch.setattr(FakeTessBaseAPI, "fail_init", False)
+    return FakeTessBaseAPI
+
+
+class TestOcrEngine:
+    test_image = cv2.imread(
+        str(models.resources_dir / "images" / "test_image.png")
+    )
+
+    def get_thresholded_image(self):
+        h, w = self.test_image.shape[:2]
+        img = cv2.resize(self.test_image, (w * 5, h * 5))
+        gry = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return cv2.threshold(
+            gry, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+        )[1]
+
+    def test_image_to_words(self):
+        ocr_engine = OcrEngine()
+        words = ocr_engine.image_to_words(self.get_thresholded_image())
+        assert "Parameters" in [word.text for word in words]
+        assert all(isinstance(word, OcrWord) for word in words)
+        assert ocr_engine.stats()["images"] == 1
+
+    def test_image_to_words__pytesseract(self):
+        ocr_engine = OcrEngine(use_tesserocr=False)
+        words = ocr_engine.image_to_words(self.get_thresholded_image())
+        assert ocr_engine.backend == "pytesseract"
+        assert "Parameters" in [word.text for word in words]
+
+    def test_image_to_words__single_word(self):
+        ocr_engine = OcrEngine()
+        words = ocr_engine.image_to_words(self.get_thresholded_image(), psm=8)
+        assert [word.text for word in words] == ["Parameters"]
+
+    def test_image_to_words__whitelist(self):
+        ocr_engine = OcrEngine()
+        words = ocr_engine.image_to_words(
+            self.get_thresholded_image(), psm=7, whitelist="0123456789"
+        )
+        assert all(word.text.isnumeric() for word in words)
+
+    def test_image_to_words__empty(self):
+        ocr_engine = OcrEngine()
+        assert ocr_engine.image_to_words(self.test_image[0:2, 0:2]) == []
+
+    def test_api_pool__bounded(self, fake_tesserocr):
+        engine = OcrEngine(max_apis=2)
+        apis = [engine._acquire_api(), engine._acquire_api()]
+        acquired = []
+        waiting_thread = threading.Thread(
+            target=lambda: acquired.append(engine._acquire_api())
+        )
+        waiting_thread.start()
+        waiting_thread.join(0.1)
+        assert acquired == []
+        engine._release_api(apis[0])
+        waiting_thread.join(1)
+        assert acquired == [apis[0]]
+        assert engine.stats()["apis"] == 2
+        engine._release_api(apis[1])
+        engine._release_api(acquired[0])
+        engine.close()
+        assert all(api.ended for api in apis)
+        assert engine.stats()["apis"] == 0
+
+    def test_image_to_words__tesserocr_failure(
+        self, fake_tesserocr, monkeypatch
+    ):
+        engine = OcrEngine()
+
+        def fail(*args):
+            raise RuntimeError("Recognize failed")
+
+        monkeypatch.setattr(engine, "_tesserocr_words", fail)
+        monkeypatch.setattr(engine, "_pytesseract_words", lambda *args: [])
+        assert engine.image_to_words(self.test_image) == []
+        assert engine.backend == "tesserocr"
+        assert engine.stats()["fallbacks"] == 1
+
+    def test_image_to_words__tesserocr_init_failure(
+        self, fake_tesserocr, monkeypatch
+    ):
+        monkeypatch.setattr(fake_tesserocr, "fail_init", True)
+        engine = OcrEngine(max_apis=1)
+        monkeypatch.setattr(engine, "_pytesseract_words", lambda *args: [])
+        assert engine.image_to_words(self.test_image) == []
+        assert engine.backend == "pytesseract"
+        assert engine._available.acquire(blocking=False)
+
+    @pytest.mark.parametrize("ocr_profile", constants.OCR_PROFILES)
+    def test_preprocess(self, ocr_profile):
+        scale = constants.OCR_PROFILES[ocr_profile]["scale"]
+        image = preprocess(self.test_image, ocr_profile)
+        assert image.ndim == 2
+        assert image.shape == (32 * scale, 132 * scale)
+
+    def test_preprocess__invalid_profile(self):
+        with pytest.raises(ValueError):
+            preprocess(self.test_image, "dne")
@@ -1,9 +1,46 @@
+import cv2
+import numpy as np
 import pytest
 
-from core import constants, models, process_controller
+from core import blob_store, constants, models, ocr_cache, process_controller
 from .mixins import ModelMixin
 
 
+@pytest.fixture(autouse=True)
+def empty_ocr_cache(monkeypatch):
+    """Every capture is read with OCR so the timed stages do not depend on
+    the regions that earlier tests captured"""
+    monkeypatch.setattr(
+        ocr_cache, "ocr_cache", ocr_cache.OcrResultCache(backend="memory")
+    )
+
+
+@pytest.fixture
+def numeric_test_image(tmp_path, monkeypatch):
+    """Captures the test image with the number 2468 rendered below it"""
+    test_image = cv2.imread(str(process_controller.test_image_path))
+    numeric_image = np.full((32, 132, 3), 255, dtype=np.uint8)
+    cv2.putText(
+        numeric_image,
+        "2468",
+        (8, 26),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.9,
+        (0, 0, 0),
+        2,
+    )
+    image_path = tmp_path / "numeric_test_image.png"
+    cv2.imwrite(str(image_path), np.vstack((test_image, numeric_image)))
+    monkeypatch.setattr(process_controller, "test_image_path", image_path)
+
+
+def get_numeric_texts(response: dict) -> list:
+    texts = response.get("variables")[1].split(", ")
+    assert response.get("screen_obj_ids")
+    assert all(text.replace(".", "").isnumeric() for text in texts)
+    return texts
+
+
 class TestProcessController(ModelMixin):
     conditional_test_data = [
         ("greater_than", 2, 1, True),
@@ -32,6 +69,19 @@ class TestProcessController(ModelMixin):
             == expected
         )
 
+    def test_evaluate_conditions__one_frame(self):
+        action = {
+            **self.test_action,
+            "images": ["test_image.png", "test_image_present_1.png"],
+            "haystack_image": "test_image.png",
+            "image_conditions": ["if_image_present", "if_image_present"],
+        }
+        response = process_controller.evaluate_conditions(action)
+        assert response["result"] is True
+        assert response["frame_timestamp"]
+        assert response["matches"][0]["needle"] == "test_image.png"
+        assert process_controller.evaluate_conditions(action) == response
+
     def test_action_controller(self):
         action_collection = self.get_action_collection()
         for action_id in action_collection:
@@ -54,14 +104,23 @@ class TestProcessController(ModelMixin):
 
     def test_screen_snip(self):
         response = process_controller.screen_snip(
-            0, 0, 132, 32, self.test_image
+            0, 0, 132, 32, self.test_image, include_base64=True
         )
         self.delete_image_files.append(response.id)
         assert response.width == 132
         assert response.height == 32
         assert response.is_static_position
+        assert blob_store.blob_store.has(response.blob_id)
         assert "iVBORw0KGgoAAAANSUhEUgAAAIQAAAAgCAIAAABc" in response.base64str
 
+    def test_screen_snip__without_base64(self):
+        response = process_controller.screen_snip(
+            0, 0, 132, 32, self.test_image
+        )
+        self.delete_image_files.append(response.id)
+        assert response.base64str is None
+        assert blob_store.blob_store.has(response.blob_id)
+
     def test_capture_screen_data(self):
         response = process_controller.capture_screen_data(
             0, 0, 132, 32, 0, True
@@ -74,13 +133,67 @@ class TestProcessController(ModelMixin):
         assert response.get("y1") == 0
         assert response.get("x2") == 132
         assert response.get("y2") == 32
-        assert "iVBORw0KGgoAAAANSUhEUgAAAIQAAAAgCAIAAABc" in response.get(
-            "base64str"
+        assert "iVBORw0KGgoAAAANSUhEUgAAAIQAAAAgCAIAAABc" in (
+            blob_store.blob_store.get_base64(response.get("blob_id"))
+        )
+        assert {"capture", "ocr", "store", "total"} <= set(
+            response.get("timings")
         )
 
+    def test_capture_screen_data__single_word(self):
+        response = process_controller.capture_screen_data(
+            0, 0, 132, 32, 0, True, ocr_mode="single_word"
+        )
+        self.delete_screen_data_files.append(response.get("screen_data_id"))
+        assert "Parameters" in response.get("variables")
+
+    def test_capture_screen_data__numeric(self, numeric_test_image):
+        response = process_controller.capture_screen_data(
+            0, 32, 132, 64, 0, True, ocr_mode="numeric"
+        )
+        self.delete_screen_data_files.append(response.get("screen_data_id"))
+        assert "2468" in get_numeric_texts(response)
+
+    def test_capture_screen_data__invalid_ocr_mode(self):
+        response = process_controller.capture_screen_data(
+            0, 0, 132, 32, 0, True, ocr_profile="dne", ocr_mode="dne"
+        )
+        self.delete_screen_data_files.append(response.get("screen_data_id"))
+        assert "Parameters" in response.get("variables")
+
     def test_capture_screen_data__empty(self):
+        blob_stats = blob_store.blob_store.stats()
         response = process_controller.capture_screen_data(0, 0, 2, 2, 0, True)
         assert response == {"data": "No screen objects found"}
+        assert blob_store.blob_store.stats() == blob_stats
+
+    def test_capture_screen_data_batch(self, numeric_test_image):
+        regions = [
+            models.CaptureRegion(x1=0, y1=0, x2=132, y2=32),
+            models.CaptureRegion(
+                x1=0, y1=32, x2=132, y2=64, ocr_mode="numeric"
+            ),
+            models.CaptureRegion(x1=0, y1=0, x2=2, y2=2),
+        ]
+        response = process_controller.capture_screen_data_batch(
+            regions, testing=True
+        )
+        results = response.get("data")
+        for result in results[:2]:
+            self.delete_screen_data_files.append(result.get("screen_data_id"))
+        assert len(results) == 3
+        assert "Parameters" in results[0].get("variables")
+        assert "2468" in get_numeric_texts(results[1])
+        assert results[2] == {"data": "No screen objects found"}
+        assert {"capture", "ocr", "store", "total"} <= set(
+            response.get("timings")
+        )
+
+    def test_capture_screen_data_batch__no_coordinates(self):
+        response = process_controller.capture_screen_data_batch(
+            [models.CaptureRegion(action_id="dne")], testing=True
+        )
+        assert response == {"data": "Region has no coordinates: dne"}
 
     def test_screen_shot(self):
         assert (
@@ -0,0 +1,84 @@
+import json
+import os
+
+from core import image_cache, models, serializers
+from core.search_hints import SearchHintCache
+
+
+class TestSearchHints:
+    needle = image_cache.needle_cache.get(
+        models.resources_dir / "images" / "test_image.png"
+    )
+
+    def test_get_window__no_hint(self, tmp_path):
+        hint_cache = SearchHintCache(tmp_path / "search_hints.json")
+        assert hint_cache.get_window("dne.png", self.needle) is None
+
+    def test_get_window__snip_coordinates(self, tmp_path):
+        hint_cache = SearchHintCache(tmp_path / "search_hints.json", padding=4)
+        assert hint_cache.get_window("test_image.png", self.needle) == (
+            0,
+            0,
+            136,
+            36,
+        )
+
+    def test_update__persisted(self, tmp_path):
+        hints_path = tmp_path / "search_hints.json"
+        hint_cache = SearchHintCache(hints_path, padding=10)
+        hint_cache.update("needle.png", 166, 116, self.needle)
+        assert hints_path.is_file()
+        reloaded_hint_cache = SearchHintCache(hints_path, padding=10)
+        assert reloaded_hint_cache.get_window("needle.png", self.needle) == (
+            90,
+            90,
+            242,
+            142,
+        )
+
+    def test_stats(self, tmp_path):
+        hint_cache = SearchHintCache(tmp_path / "search_hints.json")
+        hint_cache.record_hit()
+        hint_cache.record_hit()
+        hint_cache.record_miss()
+        stats = hint_cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert round(stats["hit_rate"], 2) == 0.67
+
+    def test_get_window__snip_coordinates_changed(self, tmp_path):
+        image_json_path = tmp_path / "needle.json"
+        image_json_path.write_text(
+            json.dumps({"x1": 20, "y1": 20, "is_static_position": True})
+        )
+        hint_cache = SearchHintCache(
+            tmp_path / "search_hints.json", padding=0, images_dir=tmp_path
+        )
+        assert hint_cache.get_window("needle.png", self.needle)[:2] == (20, 20)
+        image_json_path.write_text(
+            json.dumps({"x1": 40, "y1": 50, "is_static_position": True})
+        )
+        os.utime(image_json_path, ns=(0, 10**9))
+        assert hint_cache.get_window("needle.png", self.needle)[:2] == (40, 50)
+
+    def test_get_window__msgpack_snip_coordinates(self, tmp_path):
+        serializers.dump_file(
+            {"x1": 20, "y1": 30, "is_static_position": True},
+            tmp_path / "needle.json",
+            "msgpack",
+        )
+        hint_cache = SearchHintCache(
+            tmp_path / "search_hints.json", padding=0, images_dir=tmp_path
+        )
+        assert hint_cache.get_window("needle.png", self.needle)[:2] == (20, 30)
+
+    def test_update__merges_other_workers(self, tmp_path):
+        hints_path = tmp_path / "search_hints.json"
+        hint_cache = SearchHintCache(hints_path, padding=0)
+        other_hint_cache = SearchHintCache(hints_path, padding=0)
+        hint_cache.update("needle.png", 166, 116, self.needle)
+        other_hint_cache.get_window("dne.png", self.needle)
+        hint_cache.update("other.png", 166, 116, self.needle)
+        other_hint_cache.update("needle_2.png", 166, 116, self.needle)
+        hints = json.loads(hints_path.read_text())
+        assert set(hints) == {"needle.png", "other.png", "needle_2.png"}
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from core import serializers
+
+
+class TestSerializers:
+    resource = {
+        "id": "1",
+        "function": "click",
+        "variables": ["a", "b"],
+        "x1": 0,
+    }
+
+    @pytest.mark.parametrize("resource_format", serializers.FORMATS)
+    def test_dumps_and_loads(self, resource_format):
+        data = serializers.dumps(self.resource, resource_format)
+        assert serializers.loads(data) == self.resource
+
+    def test_formats(self):
+        pretty = serializers.dumps(self.resource, "pretty")
+        compact = serializers.dumps(self.resource, "compact")
+        binary = serializers.dumps(self.resource, "msgpack")
+        assert pretty == json.dumps(self.resource, indent=6).encode("utf-8")
+        assert len(binary) < len(compact) < len(pretty)
+        assert serializers.detect_format(pretty) == "json"
+        assert serializers.detect_format(b"\n [1]") == "json"
+        assert serializers.detect_format(binary) == "msgpack"
+
+    def test_dumps__invalid_format(self):
+        with pytest.raises(ValueError):
+            serializers.dumps(self.resource, "xml")
+
+    def test_dump_file(self, tmp_path):
+        file_path = tmp_path / "1.json"
+        serializers.dump_file(self.resource, file_path, "msgpack")
+        assert serializers.load_file(file_path) == self.resource
+        with pytest.raises(FileExistsError):
+            serializers.dump_file(self.resource, file_path, exclusive=True)
+        serializers.dump_file(self.resource, file_path, "compact")
+        assert serializers.load_file(file_path) == self.resource
@@ -0,0 +1,34 @@
+import time
+
+from core.stage_timer import StageStats, StageTimer
+
+
+class TestStageTimer:
+    def test_finish(self):
+        stats = StageStats()
+        timer = StageTimer("pipeline", stats)
+        with timer.stage("sleep"):
+            time.sleep(0.01)
+        with timer.stage("noop"):
+            pass
+        timings = timer.finish()
+        assert set(timings) == {"sleep", "noop", "total"}
+        assert timings["sleep"] >= 10
+        assert timings["total"] >= timings["sleep"]
+
+    def test_stats(self):
+        stats = StageStats()
+        for duration in (1.0, 3.0):
+            stats.record("pipeline", {"ocr": duration})
+        assert stats.stats() == {
+            "pipeline": {"ocr": {"count": 2, "mean_ms": 2.0, "max_ms": 3.0}}
+        }
+        stats.clear()
+        assert stats.stats() == {}
+
+    def test_stage__repeated(self):
+        timer = StageTimer("pipeline", StageStats())
+        for _ in range(2):
+            with timer.stage("sleep"):
+                time.sleep(0.005)
+        assert timer.finish()["sleep"] >= 10